@@ -0,0 +1,253 @@
+# ASGI entry point: async handlers on AsyncSession for the hot paths (login, users, orders and the
+# product listings), with every other route, and anything those handlers don't cover, served by
+# the Flask app.
+#   uvicorn asgi:app --port 5555
+#   SERVER_MODE=asgi gunicorn -c gunicorn.conf.py asgi:app
+import asyncio
+import contextlib
+import jwt
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags
+from app import create_app, CORS_ORIGIN, CORS_EXPOSE_HEADERS
+from catalog import (
+    catalog_cache_key, catalog_cache_entry, catalog_page, catalog_statement, clamp_limit,
+    CATALOG_SECTIONS, DEFAULT_PAGE_SIZE,
+)
+from compression import available_encodings, compress
+from hashing import HasherBusy
+from jobs import enqueue
+from models import db, enable_sqlite_pragmas, User, Product, Order, OrderProduct
+from orders import Orders
+from pricing import InvalidOrderLine, normalize_order_lines
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+flask_app = create_app()
+password_hasher = flask_app.extensions['password_hasher']
+price_index = flask_app.extensions['price_index']
+catalog_cache = flask_app.extensions['catalog_cache']
+
+PRODUCT_PATHS = {'/products': Product, **{f'/{name}': model for name, model in CATALOG_SECTIONS.items()}}
+
+def async_database_url(url):
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+# Flask-SQLAlchemy resolves relative SQLite paths against the instance folder; reuse its URL
+with flask_app.app_context():
+    engine = create_async_engine(async_database_url(db.engine.url), **flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+enable_sqlite_pragmas(engine.sync_engine, flask_app.config['SQLITE_BUSY_TIMEOUT'], flask_app.config['SQLITE_MMAP_SIZE'])
+Session = async_sessionmaker(engine, expire_on_commit=False)
+# SQLite allows one writer at a time. Queue this process's write transactions on the event loop,
+# rather than letting each hold the file lock across awaits while the others time out on it
+write_lock = asyncio.Lock() if engine.dialect.name == 'sqlite' else contextlib.nullcontext()
+
+def json_response(request, data, status=200, headers=None, body=None):
+    if body is None:
+        body = (flask_app.json.dumps(data) + "\n").encode()
+    headers = {'Content-Type': 'application/json', 'Vary': 'Accept-Encoding', **(headers or {})}
+    if request.headers.get('origin') == CORS_ORIGIN:
+        headers['Access-Control-Allow-Origin'] = CORS_ORIGIN
+        headers['Access-Control-Expose-Headers'] = ', '.join(CORS_EXPOSE_HEADERS)
+    if status == 200 and len(body) >= flask_app.config['COMPRESS_MIN_SIZE']:
+        encoding = parse_accept_header(request.headers.get('accept-encoding')).best_match(available_encodings())
+        if encoding is not None:
+            body = compress(body, encoding, flask_app.config['COMPRESS_GZIP_LEVEL'], flask_app.config['COMPRESS_BROTLI_QUALITY'])
+            headers['Content-Encoding'] = encoding
+            if 'ETag' in headers:
+                headers['ETag'] = f'W/{headers["ETag"]}'
+    return Response(body, status_code=status, headers=headers)
+
+def error(request, message, status, key="error"):
+    return json_response(request, {key: message}, status)
+
+# Tokens are interchangeable with the Flask app's: same key, algorithm and claims
+def jwt_identity(request):
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme != 'Bearer' or not token:
+        return None, error(request, "Missing Authorization Header", 401, key="msg")
+    try:
+        claims = jwt.decode(
+            token, flask_app.config['JWT_SECRET_KEY'],
+            algorithms=[flask_app.config.get('JWT_ALGORITHM', 'HS256')],
+        )
+    except jwt.InvalidTokenError as e:
+        return None, error(request, str(e), 422, key="msg")
+    if claims.get('type') != 'access':
+        return None, error(request, "Only non-refresh tokens are allowed", 422, key="msg")
+    return claims['sub'], None
+
+def access_token(user):
+    with flask_app.app_context():
+        return create_access_token(identity=user.user_id, additional_claims={"role": user.role})
+
+def in_app_context(fn, *args):
+    with flask_app.app_context():
+        return fn(*args)
+
+async def login(request):
+    data = await request.json()
+    async with Session() as session:
+        user = (await session.execute(select(User).filter_by(email=data.get('email')))).scalars().first()
+        if user is None or not await asyncio.to_thread(password_hasher.check_password_hash, user.password, data.get('password')):
+            return error(request, "Invalid credentials", 401)
+        # Upgrade hashes made with a different work factor while we have the plain password
+        if password_hasher.needs_rehash(user.password):
+            try:
+                user.password = await asyncio.to_thread(password_hasher.generate_password_hash, data.get('password'))
+                async with write_lock:
+                    await session.commit()
+            except HasherBusy:
+                pass
+        return json_response(request, {"access_token": access_token(user), "role": user.role, "id": user.user_id})
+
+async def list_users(request):
+    if request.query_params.get('expand'):
+        return None
+    async with Session() as session:
+        rows = (await session.execute(User.projection.statement)).all()
+    return json_response(request, User.projection.to_dicts(rows))
+
+async def create_user(request):
+    data = await request.json()
+    password = await asyncio.to_thread(password_hasher.generate_password_hash, data.get("password"))
+    async with Session() as session:
+        async with write_lock:
+            if (await session.execute(select(User.user_id).filter_by(email=data['email']))).first():
+                return error(request, "Email already exists", 422)
+            new_user = User(
+                user_name=data['user_name'],
+                email=data['email'],
+                password=password,
+                role=data.get('role', 'customer'),
+                phone_number=data['phone_number'],
+            )
+            session.add(new_user)
+            await session.commit()
+        user = await session.run_sync(lambda _: new_user.to_dict())
+    return json_response(request, {"user": user, "access_token": access_token(new_user)}, 201)
+
+async def list_orders(request):
+    current_user_id, failed = jwt_identity(request)
+    if failed:
+        return failed
+    async with Session() as session:
+        orders = (await session.execute(
+            select(Order).options(*Orders.loader_options).filter_by(user_id=current_user_id)
+        )).scalars().all()
+        response = await session.run_sync(lambda _: [order.to_dict() for order in orders])
+    return json_response(request, response)
+
+async def create_order(request):
+    # Idempotency-Key replay and storage live in the Flask handler
+    if 'idempotency-key' in request.headers:
+        return None
+    current_user_id, failed = jwt_identity(request)
+    if failed:
+        return failed
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return error(request, "Malformed order data", 400)
+    # Prices come from the catalog, never from the client
+    try:
+        lines = normalize_order_lines(data.get('order_products'))
+        subtotals = await asyncio.to_thread(in_app_context, price_index.price_lines, lines)
+    except InvalidOrderLine as e:
+        return error(request, str(e), 422)
+    new_order = Order(
+        user_id=current_user_id,
+        total_price=round(sum(subtotals), 2),
+        order_products=[
+            OrderProduct(product_id=line['product_id'], quantity=line['quantity'], subtotal=subtotal)
+            for line, subtotal in zip(lines, subtotals)
+        ]
+    )
+    async with Session() as session:
+        async with write_lock:
+            session.add(new_order)
+            await session.flush()
+            enqueue(session, 'send_order_confirmation', order_id=new_order.id)
+            await session.commit()
+        response = await session.run_sync(lambda _: new_order.to_dict())
+    return json_response(request, response, 201)
+
+# The rules werkzeug's make_conditional applies for the Flask routes: If-None-Match when sent,
+# otherwise If-Modified-Since
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return parse_etags(if_none_match).contains_weak(etag)
+    if_modified_since = parse_date(request.headers.get('if-modified-since'))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+# Same cache, keys and validators as the Flask catalog_response, so either path can serve a hit
+async def list_catalog(request):
+    if request.query_params.get('expand'):
+        return None
+    model = PRODUCT_PATHS[request.url.path]
+    args = MultiDict(request.query_params.multi_items())
+    key = catalog_cache_key(request.url.path, args)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        generation = catalog_cache.generation
+        limit = clamp_limit(args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+        async with Session() as session:
+            rows = (await session.execute(catalog_statement(model, args, limit))).all()
+        cached = in_app_context(catalog_cache_entry, *catalog_page(model, rows, limit))
+        catalog_cache.set(key, cached, model.projection.tables(), generation)
+    body, next_cursor, etag, last_modified = cached
+    headers = {'ETag': f'"{etag}"', 'Last-Modified': http_date(last_modified), 'Cache-Control': 'no-cache'}
+    if next_cursor is not None:
+        headers['X-Next-Cursor'] = str(next_cursor)
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return json_response(request, None, headers=headers, body=body)
+
+# Dispatches by method to an async handler; a handler returning None hands the request to Flask
+class AsyncView:
+    def __init__(self, **handlers):
+        self.handlers = handlers
+
+    async def __call__(self, scope, receive, send):
+        request = Request(scope, receive)
+        try:
+            response = await self.handlers[request.method](request)
+        except HasherBusy:
+            response = json_response(request, {"error": "Authentication is busy, please retry shortly"}, 503, {'Retry-After': '1'})
+        if response is None:
+            await wsgi(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+
+wsgi = WSGIMiddleware(flask_app)
+
+routes = [
+    Route('/login', AsyncView(POST=login), methods=['POST']),
+    Route('/users', AsyncView(GET=list_users, POST=create_user), methods=['GET', 'POST']),
+    Route('/orders', AsyncView(GET=list_orders, POST=create_order), methods=['GET', 'POST']),
+    *(Route(path, AsyncView(GET=list_catalog), methods=['GET']) for path in PRODUCT_PATHS),
+    # Other methods on the paths above (OPTIONS, admin writes) fall through to here as well
+    Mount('/', app=wsgi),
+]
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Requests served here never reach Flask's before_request, so start the job workers now
+    job_queue = flask_app.extensions['job_queue']
+    if job_queue.workers:
+        job_queue.start()
+    yield
+    job_queue.stop(timeout=5)
+    await engine.dispose()
+
+app = Starlette(routes=routes, lifespan=lifespan)
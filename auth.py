@@ -0,0 +1,33 @@
+from flask import make_response, jsonify
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from functools import wraps
+from extensions import identity_cache
+from models import db, User
+
+# Role of the authenticated user, or None if they no longer exist
+def current_role():
+    # The role claim can only narrow access; an admin claim is confirmed against the identity cache
+    claimed = get_jwt().get('role')
+    if claimed is not None and claimed != 'admin':
+        return claimed
+    user_id = get_jwt_identity()
+    role = identity_cache.get(user_id)
+    if role is None:
+        generation = identity_cache.generation
+        user = db.session.get(User, user_id)
+        role = user.role if user else ''
+        identity_cache.set(user_id, role, (), generation)
+    return role or None
+
+# Decorator for Admin Access
+def admin_required(fn):
+    @wraps(fn)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        role = current_role()
+        if role is None:
+            return make_response(jsonify({"error": "User not found"}), 404)
+        if role != 'admin':
+            return make_response(jsonify({"error": "Admin access required"}), 403)
+        return fn(*args, **kwargs)
+    return wrapper
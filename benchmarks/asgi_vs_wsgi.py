@@ -0,0 +1,68 @@
+# The load scenario against gunicorn serving app:create_app() (WSGI, gthread) and asgi:app (ASGI, uvicorn),
+# both on the same seeded SQLite database.
+#   python -m benchmarks.asgi_vs_wsgi --clients 64 --duration 30 --workers 2
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import requests
+from benchmarks.common import add_scale_arguments, seeded_app
+from benchmarks.load import run_load, report
+
+MODES = {'wsgi': 'app:create_app()', 'asgi': 'asgi:app'}
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+def main():
+    parser = add_scale_arguments(argparse.ArgumentParser(), users=10_000, orders=50_000)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--modes', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    _, path = seeded_app(args)
+    results = {}
+    for mode in args.modes.split(','):
+        port = free_port()
+        env = {
+            **os.environ,
+            'DATABASE_URL': f'sqlite:///{path}',
+            'SERVER_MODE': mode,
+            'BIND': f'127.0.0.1:{port}',
+            'WEB_CONCURRENCY': str(args.workers),
+            'GUNICORN_THREADS': str(args.threads),
+        }
+        process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', MODES[mode]], env=env)
+        try:
+            base_url = f'http://127.0.0.1:{port}'
+            wait_until_up(base_url + '/', process)
+            results[mode] = run_load(base_url, args.clients, args.duration, args.users, args.seed)
+        finally:
+            process.terminate()
+            process.wait()
+
+    for mode, (recorder, elapsed) in results.items():
+        print(f"\n{mode}: {MODES[mode]}, {args.workers} workers, {args.clients} clients for {elapsed:.1f}s")
+        report(recorder, elapsed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+# Shared setup for the app-level benchmarks: a throwaway SQLite database seeded with synthetic data.
+import os
+import tempfile
+import time
+
+PASSWORD = 'benchmark-password'
+
+def add_scale_arguments(parser, users=10_000, orders=250_000):
+    parser.add_argument('--users', type=int, default=users)
+    parser.add_argument('--orders', type=int, default=orders)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--lines-per-order', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    return parser
+
+def seeded_app(args):
+    # Exported too, so servers started from a benchmark open the same database
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from app import create_app
+    from extensions import password_hasher
+    from models import db, rebuild_daily_rollup
+    from seed import seed_synthetic
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            counts = seed_synthetic(
+                connection, args.users, args.orders, [password_hasher.generate_password_hash(PASSWORD)],
+                products=args.products, lines_per_order=args.lines_per_order, seed=args.seed,
+            )
+            rebuild_daily_rollup(connection)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+    elapsed = time.perf_counter() - started
+    print(f"seeded {', '.join(f'{count} {name}' for name, count in counts.items())} in {elapsed:.1f}s")
+    return app, path
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
@@ -0,0 +1,93 @@
+# Serialization time and bytes on the wire for /orders and /beamblocks, stdlib json vs orjson.
+#   python -m benchmarks.json_compression --orders 500 --products 200
+import argparse
+import gzip
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def seed(db, models, users, orders, products, rng):
+    User, BeamBlock, Order, OrderProduct = models
+    db.session.add_all(
+        BeamBlock(price=round(rng.uniform(5, 50), 2), image_url=f'/images/{i:020x}.jpg',
+                  description=f'Beam block variant {i} for suspended floors')
+        for i in range(products)
+    )
+    db.session.add(User(user_name='bench', email='bench@example.com', password='x', role='customer',
+                        phone_number='0712345678'))
+    db.session.commit()
+    start = datetime(2024, 1, 1)
+    for i in range(orders):
+        lines = [
+            OrderProduct(product_id=rng.randint(1, products), quantity=rng.randint(1, 20),
+                         subtotal=round(rng.uniform(5, 500), 2))
+            for _ in range(rng.randint(1, 5))
+        ]
+        db.session.add(Order(user_id=1, order_date=start + timedelta(hours=i),
+                             total_price=round(sum(line.subtotal for line in lines), 2), order_products=lines))
+    db.session.commit()
+
+def time_dumps(provider, payload, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = provider.dumps(payload)
+    return (time.perf_counter() - started) / repeat * 1000, body.encode()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    from flask.json.provider import DefaultJSONProvider
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from models import db, User, BeamBlock, Order, OrderProduct
+    from serialization import orjson
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+    catalog_cache = app.extensions['catalog_cache']
+    with app.app_context():
+        db.create_all()
+        seed(db, (User, BeamBlock, Order, OrderProduct), 1, args.orders, args.products, random.Random(args.seed))
+        token = create_access_token(identity=1, additional_claims={'role': 'customer'})
+        stdlib = DefaultJSONProvider(app)
+        stdlib.compact = True
+        fast = app.json
+
+    client = app.test_client()
+    endpoints = {
+        '/orders': {'Authorization': f'Bearer {token}'},
+        f'/beamblocks?limit={min(args.products, 200)}': {},
+    }
+    print(f"orjson {'installed' if orjson else 'missing'}, brotli {'installed' if brotli else 'missing'}")
+    print(f"{'endpoint':22} {'stdlib ms':>10} {'orjson ms':>10} {'raw B':>9} {'gzip B':>9} {'br B':>9} {'req ms':>8}")
+    for url, headers in endpoints.items():
+        payload = client.get(url, headers={**headers, 'Accept-Encoding': 'identity'}).get_json()
+        with app.app_context():
+            stdlib_ms, body = time_dumps(stdlib, payload, args.repeat)
+            fast_ms, _ = time_dumps(fast, payload, args.repeat)
+        gzip_size = len(gzip.compress(body, compresslevel=app.config['COMPRESS_GZIP_LEVEL']))
+        br_size = len(brotli.compress(body, quality=app.config['COMPRESS_BROTLI_QUALITY'])) if brotli else 0
+
+        # Full round trip with negotiation; the catalog cache is cleared so every request rebuilds
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            catalog_cache.clear()
+            client.get(url, headers={**headers, 'Accept-Encoding': 'br, gzip'})
+        request_ms = (time.perf_counter() - started) / args.repeat * 1000
+        print(f"{url.split('?')[0]:22} {stdlib_ms:10.3f} {fast_ms:10.3f} {len(body):9} {gzip_size:9} {br_size:9} {request_ms:8.2f}")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
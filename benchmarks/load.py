@@ -0,0 +1,115 @@
+# Closed-loop load test: each virtual user logs in, browses the catalog and places orders.
+# Reports requests/second and p50/p95/p99 latency per endpoint.
+#   python -m benchmarks.load --clients 16 --duration 30                      (seeds and serves a temp database)
+#   python -m benchmarks.load --url http://localhost:5555 --clients 16 --duration 30
+import argparse
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+import requests
+from benchmarks.common import PASSWORD, add_scale_arguments, seeded_app, percentile
+
+SEARCH_TERMS = ('beam', 'paving', 'reinforced', 'service', 'smooth kerb')
+CATEGORY_PATHS = ('/beamblocks', '/hollowblocks', '/pavingblocks', '/roadkerbs', '/services')
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, name, started, response):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            if response is None or response.status_code >= 400:
+                self.errors[name] += 1
+
+def virtual_user(base_url, user_ids, product_ids, deadline, recorder, rng):
+    session = requests.Session()
+
+    def call(name, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=30, **kwargs)
+        except requests.RequestException:
+            response = None
+        recorder.record(name, started, response)
+        return response
+
+    while time.monotonic() < deadline:
+        user_id = rng.choice(user_ids)
+        response = call('POST /login', 'POST', '/login', json={'email': f'user{user_id}@example.com', 'password': PASSWORD})
+        if response is None or response.status_code != 200:
+            continue
+        session.headers['Authorization'] = f"Bearer {response.json()['access_token']}"
+        for _ in range(5):
+            if time.monotonic() >= deadline:
+                break
+            call('GET /products', 'GET', '/products?limit=50')
+            path = rng.choice(CATEGORY_PATHS)
+            call('GET /<category>', 'GET', path)
+            call('GET /search', 'GET', f'/search?q={rng.choice(SEARCH_TERMS)}')
+            lines = [{'product_id': rng.choice(product_ids), 'quantity': rng.randint(1, 10)} for _ in range(rng.randint(1, 4))]
+            call('POST /orders', 'POST', '/orders', json={'order_products': lines})
+            call('GET /orders', 'GET', '/orders')
+        session.headers.pop('Authorization', None)
+
+def serve(app):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+def run_load(base_url, clients, duration, users, seed):
+    base_url = base_url.rstrip('/')
+    product_ids = [product['id'] for product in requests.get(f'{base_url}/products?limit=200', timeout=30).json()]
+    user_ids = list(range(2, users + 1))
+
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=virtual_user, args=(base_url, user_ids, product_ids, deadline, recorder, random.Random(seed + i)))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder, time.perf_counter() - started
+
+def report(recorder, elapsed):
+    print(f"{'endpoint':16} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    total = 0
+    for name, latencies in sorted(recorder.latencies.items()):
+        latencies.sort()
+        total += len(latencies)
+        print(f"{name:16} {len(latencies):9} {recorder.errors[name]:7} {len(latencies) / elapsed:8.1f} "
+              f"{percentile(latencies, 0.50):8.1f} {percentile(latencies, 0.95):8.1f} {percentile(latencies, 0.99):8.1f}")
+    print(f"{'total':16} {total:9} {sum(recorder.errors.values()):7} {total / elapsed:8.1f}")
+
+def main():
+    parser = add_scale_arguments(argparse.ArgumentParser(), users=10_000, orders=50_000)
+    parser.add_argument('--url', help='Target a running server seeded by seed_synthetic instead of a temp database')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        app, _ = seeded_app(args)
+        server, base_url = serve(app)
+    recorder, elapsed = run_load(base_url, args.clients, args.duration, args.users, args.seed)
+    if server is not None:
+        server.shutdown()
+
+    print(f"{args.clients} clients for {elapsed:.1f}s against {base_url}")
+    report(recorder, elapsed)
+
+if __name__ == '__main__':
+    main()
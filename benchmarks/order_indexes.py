@@ -0,0 +1,97 @@
+# Before/after timings for the order lookup indexes on a seeded SQLite database.
+#   python -m benchmarks.order_indexes --lines 2000000
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateIndex
+from models import db, Order, OrderProduct
+
+QUERIES = {
+    'orders by user (Orders.get)':
+        'SELECT * FROM orders WHERE user_id = :key ORDER BY order_date',
+    'lines by order (selectinload)':
+        'SELECT * FROM order_products WHERE order_id IN (:key, :key + 1, :key + 2, :key + 3)',
+    'lines by product':
+        'SELECT count(*) FROM order_products WHERE product_id = :key',
+}
+
+def seed(conn, users, orders, lines, products, rng):
+    start = datetime(2024, 1, 1)
+    conn.execute(text(
+        "INSERT INTO products (id, category, price) VALUES (:id, 'beamblock', 10)"
+    ), [{'id': i} for i in range(1, products + 1)])
+    conn.execute(text(
+        "INSERT INTO users (user_id, user_name, email, password, role, phone_number) "
+        "VALUES (:id, :name, :email, 'x', 'customer', '0712345678')"
+    ), [{'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com'} for i in range(1, users + 1)])
+    conn.execute(text(
+        "INSERT INTO orders (id, user_id, order_date, total_price) VALUES (:id, :user_id, :order_date, 0)"
+    ), [{'id': i, 'user_id': rng.randint(1, users), 'order_date': start + timedelta(minutes=i)}
+        for i in range(1, orders + 1)])
+    chunk = 100_000
+    for offset in range(0, lines, chunk):
+        rows = [
+            {'id': i, 'order_id': rng.randint(1, orders), 'product_id': rng.randint(1, products)}
+            for i in range(offset + 1, min(offset + chunk, lines) + 1)
+        ]
+        conn.execute(text(
+            "INSERT INTO order_products (id, order_id, product_id, quantity) VALUES (:id, :order_id, :product_id, 1)"
+        ), rows)
+
+def time_queries(conn, keys, repeat):
+    results = {}
+    for name, sql in QUERIES.items():
+        statement = text(sql)
+        started = time.perf_counter()
+        for key in keys[:repeat]:
+            conn.execute(statement, {'key': key}).all()
+        results[name] = (time.perf_counter() - started) / repeat * 1000
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--orders', type=int, default=200_000)
+    parser.add_argument('--lines', type=int, default=2_000_000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    indexes = [*Order.__table__.indexes, *OrderProduct.__table__.indexes]
+
+    with engine.begin() as conn:
+        # Create the tables as the initial migration did, without the indexes
+        for index in indexes:
+            index.table.indexes.discard(index)
+        db.metadata.create_all(conn)
+        for index in indexes:
+            index.table.indexes.add(index)
+        started = time.perf_counter()
+        seed(conn, args.users, args.orders, args.lines, args.products, rng)
+        print(f"seeded {args.lines} order lines in {time.perf_counter() - started:.1f}s")
+
+    keys = [rng.randint(1, min(args.users, args.products)) for _ in range(args.repeat)]
+    with engine.connect() as conn:
+        before = time_queries(conn, keys, args.repeat)
+    with engine.begin() as conn:
+        for index in indexes:
+            conn.execute(CreateIndex(index))
+        conn.execute(text('ANALYZE'))
+    with engine.connect() as conn:
+        after = time_queries(conn, keys, args.repeat)
+
+    print(f"{'query':32} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in QUERIES:
+        print(f"{name:32} {before[name]:10.3f} {after[name]:10.3f} {before[name] / after[name]:7.0f}x")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# Startup cost of each entry point, timed in fresh interpreters, plus the packages that take
+# longest to import according to `python -X importtime`.
+#   python -m benchmarks.startup [--repeat 10] [--top 15]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CASES = {
+    'import app': 'import app',
+    'create_app()': 'from app import create_app; create_app()',
+    'create_app() + first request': (
+        "from app import create_app; create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'}).test_client().get('/')"
+    ),
+    'import asgi': 'import asgi',
+}
+# CLI invocations, run through the same interpreter
+COMMANDS = {
+    'flask --help': ['-m', 'flask', '--help'],
+    'flask db current': ['-m', 'flask', 'db', 'current'],
+}
+
+def timed(args, env, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, *args], env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+# -X importtime lines are "import time: self [us] | cumulative | imported package"; self times are
+# summed by top-level package, so e.g. everything under sqlalchemy counts once
+def slowest_packages(code, env, top):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, check=True,
+                            capture_output=True, text=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    return sorted(((us, package) for package, us in packages.items()), reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    # An empty database, so nothing depends on local data; .env settings still apply
+    path = os.path.join(tempfile.mkdtemp(), 'startup.db')
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{path}', 'FLASK_APP': 'app'}
+
+    print(f"{'case':32} {'min ms':>8} {'p50 ms':>8} {'max ms':>8}")
+    baseline = timed(['-c', 'pass'], env, args.repeat)
+    print(f"{'python -c pass':32} {baseline[0]:8.1f} {statistics.median(baseline):8.1f} {baseline[-1]:8.1f}")
+    cases = {name: ['-c', code] for name, code in CASES.items()}
+    for name, command in {**cases, **COMMANDS}.items():
+        timings = timed(command, env, args.repeat)
+        print(f"{name:32} {timings[0]:8.1f} {statistics.median(timings):8.1f} {timings[-1]:8.1f}")
+
+    # What each test pays for a fresh app once the modules are imported
+    from app import create_app
+    create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f"{'create_app() in a warm process':32} {timings[0]:8.1f} {statistics.median(timings):8.1f} {timings[-1]:8.1f}")
+
+    print("\nslowest packages to import for create_app() (ms)")
+    for us, package in slowest_packages(CASES['create_app()'], env, args.top):
+        print(f"  {us / 1000:8.1f}  {package}")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
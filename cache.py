@@ -0,0 +1,166 @@
+import inspect
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Bounded LRU cache with a TTL, for serialized responses and other per-process lookups
+class TTLCache:
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # Counts invalidations; set() drops a value only if something it depends on changed since
+        # the generation it was built at
+        self.generation = 0
+        self._table_changes = {}
+        self._key_changes = OrderedDict()
+        self._stale_before = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, tables, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, tables, generation=None):
+        with self._lock:
+            # A write to its tables or key committed while this value was being built, so it may be stale
+            if generation is not None and self._changed_since(key, tables, generation):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _changed_since(self, key, tables, generation):
+        if self._stale_before > generation or self._key_changes.get(key, 0) > generation:
+            return True
+        return any(self._table_changes.get(table, 0) > generation for table in tables)
+
+    def invalidate(self, tables):
+        with self._lock:
+            self.generation += 1
+            for table in tables:
+                self._table_changes[table] = self.generation
+            stale = [key for key, (_, entry_tables, _) in self._entries.items() if entry_tables & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def discard(self, keys):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._key_changes[key] = self.generation
+                self._key_changes.move_to_end(key)
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+            # Forgetting the oldest changes means builds from before them can't be checked, so they're dropped
+            while len(self._key_changes) > self.maxsize:
+                _, changed = self._key_changes.popitem(last=False)
+                self._stale_before = max(self._stale_before, changed)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._stale_before = self.generation
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+# Commit listeners, registered once on the Session class below and shared by every app. They are
+# held by weak reference, so an app that is discarded (e.g. after a test) doesn't leave its caches
+# alive or its listeners running on later commits.
+_write_listeners = []
+_instance_trackers = []
+
+class _InstanceTracker:
+    def __init__(self, cache, model, key):
+        self.cache = weakref.ref(cache)
+        self.model = model
+        self.key = key
+
+# Report the tables written in each committed transaction to every listener, e.g. cache.invalidate
+def track_writes(*listeners):
+    for listener in listeners:
+        _write_listeners.append(weakref.WeakMethod(listener) if inspect.ismethod(listener) else weakref.ref(listener))
+
+# Drop cached entries for instances of a model once a transaction touching them commits
+def track_instances(cache, model, key):
+    _instance_trackers.append(_InstanceTracker(cache, model, key))
+
+def _prune():
+    _write_listeners[:] = [ref for ref in _write_listeners if ref() is not None]
+    _instance_trackers[:] = [tracker for tracker in _instance_trackers if tracker.cache() is not None]
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+@event.listens_for(Session, 'after_flush')
+def _record_flush(session, flush_context):
+    changed = _changed_tables(session)
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        changed.add(instance.__table__.name)
+    # Keys are taken now, while the instances are still loaded
+    changed_keys = session.info.setdefault('changed_keys', {})
+    for tracker in _instance_trackers:
+        for instance in (*session.dirty, *session.deleted):
+            if isinstance(instance, tracker.model):
+                changed_keys.setdefault(tracker, set()).add(tracker.key(instance))
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate(session):
+    changed = session.info.pop('changed_tables', None)
+    changed_keys = session.info.pop('changed_keys', None)
+    if changed:
+        for ref in list(_write_listeners):
+            listener = ref()
+            if listener is not None:
+                listener(changed)
+    if changed_keys:
+        for tracker, keys in changed_keys.items():
+            cache = tracker.cache()
+            if cache is not None:
+                cache.discard(keys)
+    _prune()
+
+@event.listens_for(Session, 'after_rollback')
+def _discard(session):
+    session.info.pop('changed_tables', None)
+    session.info.pop('changed_keys', None)
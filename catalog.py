@@ -0,0 +1,322 @@
+from flask import current_app, make_response, request, jsonify, send_from_directory
+from flask_restful import Resource
+from datetime import datetime, timezone
+import hashlib
+import re
+from sqlalchemy import bindparam, case, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from auth import admin_required
+from extensions import catalog_cache
+from images import InvalidImage, ingest_image
+from models import db, Product, BeamBlock, HollowBlock, PavingBlock, RoadKerb, Service, Gallery, OrderProduct
+
+# Keyset pagination shared by the catalog resources
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def clamp_limit(limit):
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def page_limit():
+    return clamp_limit(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int))
+
+# Shared with the async handlers in asgi.py, so `args` is any werkzeug MultiDict
+def catalog_statement(model, args, limit):
+    statement = model.projection.statement
+
+    after = args.get('after', type=int)
+    if after is not None:
+        statement = statement.where(model.id > after)
+
+    category = args.get('category')
+    if category and hasattr(model, 'category'):
+        statement = statement.where(model.category == category)
+
+    if hasattr(model, 'price'):
+        min_price = args.get('min_price', type=float)
+        max_price = args.get('max_price', type=float)
+        if min_price is not None:
+            statement = statement.where(model.price >= min_price)
+        if max_price is not None:
+            statement = statement.where(model.price <= max_price)
+
+    if hasattr(model, 'description'):
+        description = args.get('description')
+        if description:
+            pattern = description.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            statement = statement.where(model.description.ilike(f'%{pattern}%', escape='\\'))
+
+    # Fetch one extra row to know whether another page exists
+    return statement.order_by(model.id).limit(limit + 1)
+
+def catalog_page(model, rows, limit):
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return model.projection.to_dicts(rows[:limit]), next_cursor
+
+def paginate_catalog(model):
+    limit = page_limit()
+    rows = db.session.execute(catalog_statement(model, request.args, limit)).all()
+    return catalog_page(model, rows, limit)
+
+def requested_expansions():
+    return [name for name in request.args.get('expand', '').split(',') if name]
+
+def catalog_cache_key(path, args):
+    return (path, tuple(sorted(args.items(multi=True))))
+
+def catalog_cache_entry(records, next_cursor):
+    body = (current_app.json.dumps(records) + "\n").encode()
+    # Content-derived validators stay correct across workers with separate caches
+    etag = hashlib.sha1(body).hexdigest()
+    return (body, next_cursor, etag, datetime.now(timezone.utc).replace(microsecond=0))
+
+def cached_json_response(tables, build):
+    # build() returns (records, next_cursor); the serialized result is cached until `tables` change
+    key = catalog_cache_key(request.path, request.args)
+    cached = catalog_cache.get(key)
+    if cached is None:
+        generation = catalog_cache.generation
+        cached = catalog_cache_entry(*build())
+        catalog_cache.set(key, cached, tables, generation)
+    body, next_cursor, etag, last_modified = cached
+    response = make_response(body, 200, {"Content-Type": "application/json"})
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    # Answers If-None-Match / If-Modified-Since with an empty 304
+    return response.make_conditional(request)
+
+def catalog_response(model):
+    expansions = requested_expansions()
+
+    def build():
+        records, next_cursor = paginate_catalog(model)
+        return model.projection.expand(records, expansions), next_cursor
+
+    return cached_json_response(model.projection.tables(expansions), build)
+
+# Admin view of the catalog cache counters
+@admin_required
+def cache_stats():
+    return jsonify(catalog_cache.stats()), 200
+
+# Ingested images are named by content hash, so a URL's bytes never change
+def image_file(filename):
+    response = send_from_directory(current_app.config['IMAGE_DIR'], filename)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# Body of an admin write: multipart form with an `image` file, or JSON with an image_url
+def request_data_with_image():
+    upload = request.files.get('image')
+    if upload is None:
+        data = request.get_json()
+        return data, {'image_url': data.get('image_url')}
+    image_url, image_srcset = ingest_image(upload.read(), current_app.config['IMAGE_DIR'])
+    return request.form, {'image_url': image_url, 'image_srcset': image_srcset}
+
+# Product Resources: one generic resource per catalog category, plus /products across all of them
+class ProductResource(Resource):
+    model = Product
+    id_key = 'product_id'
+
+    def get(self):
+        return catalog_response(self.model)
+
+    @admin_required
+    def post(self):
+        try:
+            data, image = request_data_with_image()
+        except InvalidImage as e:
+            return make_response(jsonify({"error": str(e)}), 422)
+        model = self.model
+        if model is Product:
+            mapper = inspect(Product).polymorphic_map.get(data.get('category'))
+            if mapper is None:
+                return make_response(jsonify({"error": "Unknown category"}), 422)
+            model = mapper.class_
+        new_product = model(
+            price=float(data['price']),
+            description=data.get('description'),
+            **image
+        )
+        db.session.add(new_product)
+        db.session.commit()
+        return make_response(jsonify(new_product.to_dict()), 201)
+
+    @admin_required
+    def delete(self):
+        data = request.get_json()
+        product = self.model.query.filter_by(id=data.get(self.id_key)).first_or_404()
+        # Order lines keep referencing what was bought, so an ordered product can't be deleted
+        conflict = {"error": f"{type(product).__name__} has been ordered and can't be deleted"}
+        if db.session.scalar(select(OrderProduct.id).filter_by(product_id=product.id).limit(1)) is not None:
+            return make_response(jsonify(conflict), 409)
+        db.session.delete(product)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Ordered between the check and the delete
+            db.session.rollback()
+            return make_response(jsonify(conflict), 409)
+        return make_response(jsonify({"message": f"{type(product).__name__} deleted"}), 200)
+
+def product_resource(name, model):
+    return type(name, (ProductResource,), {'model': model, 'id_key': f'{model.__mapper__.polymorphic_identity}_id'})
+
+BeamBlocks = product_resource('BeamBlocks', BeamBlock)
+HollowBlocks = product_resource('HollowBlocks', HollowBlock)
+PavingBlocks = product_resource('PavingBlocks', PavingBlock)
+RoadKerbs = product_resource('RoadKerbs', RoadKerb)
+Services = product_resource('Services', Service)
+
+# Search Resource: ranked full-text search over product descriptions
+def search_products(terms):
+    args = request.args
+    limit = page_limit()
+    # The cursor is an offset, since bm25 rank order has no stable key to page on
+    offset = max(0, args.get('after', 0, type=int))
+    category = args.get('category')
+    fields = ', '.join(f'products.{field}' for field in Product.projection.fields)
+
+    if db.engine.dialect.name == 'sqlite':
+        # Quote every term so user input can't inject FTS5 syntax; a trailing * matches prefixes
+        query = ' '.join(f'"{term}"*' for term in terms)
+        statement = text(
+            f"SELECT {fields} FROM products_fts JOIN products ON products.id = products_fts.rowid "
+            "WHERE products_fts MATCH :query"
+            + (" AND products.category = :category" if category else "")
+            + " ORDER BY bm25(products_fts), products.id LIMIT :limit OFFSET :offset"
+        )
+    else:
+        query = None
+        statement = Product.projection.statement.where(
+            *(Product.description.ilike(f'%{term}%') for term in terms)
+        )
+        if category:
+            statement = statement.where(Product.category == category)
+        statement = statement.order_by(Product.id).limit(bindparam('limit')).offset(bindparam('offset'))
+
+    rows = db.session.execute(
+        statement, {"query": query, "category": category, "limit": limit + 1, "offset": offset}
+    ).all()
+    next_cursor = offset + limit if len(rows) > limit else None
+    return Product.projection.to_dicts(rows[:limit]), next_cursor
+
+class Search(Resource):
+    def get(self):
+        terms = re.findall(r'\w+', request.args.get('q', ''))
+        if not terms:
+            return make_response(jsonify({"error": "Query parameter q is required"}), 400)
+        return cached_json_response(Product.projection.tables(), lambda: search_products(terms))
+
+# Gallery Resource
+class GalleryResource(Resource):
+    def get(self):
+        return catalog_response(Gallery)
+
+    @admin_required
+    def post(self):
+        try:
+            data, image = request_data_with_image()
+        except InvalidImage as e:
+            return make_response(jsonify({"error": str(e)}), 422)
+        new_image = Gallery(**image)
+        db.session.add(new_image)
+        db.session.commit()
+        return make_response(jsonify(new_image.to_dict()), 201)
+
+    @admin_required
+    def delete(self):
+        data = request.get_json()
+        image_id = data.get('image_id')
+        image = Gallery.query.get_or_404(image_id)
+        db.session.delete(image)
+        db.session.commit()
+        return make_response(jsonify({"message": "Image deleted"}), 200)
+
+# Catalog Resource: every storefront section in one response, so first paint needs one request
+CATALOG_SECTIONS = {
+    'beamblocks': BeamBlock,
+    'hollowblocks': HollowBlock,
+    'pavingblocks': PavingBlock,
+    'roadkerbs': RoadKerb,
+    'services': Service,
+}
+
+def section_limit(name):
+    return clamp_limit(request.args.get(f'{name}_limit', page_limit(), type=int))
+
+def first_rows(name, rows, limit, fields, catalog, cursors):
+    catalog[name] = [{field: row._mapping[field] for field in fields} for row in rows[:limit]]
+    if len(rows) > limit:
+        cursors[name] = rows[limit - 1].id
+
+def build_catalog(sections, requested_fields):
+    catalog = {}
+    cursors = {}
+    identities = {
+        model.__mapper__.polymorphic_identity: name
+        for name, model in CATALOG_SECTIONS.items() if name in sections
+    }
+    if identities:
+        fields = tuple(field for field in Product.projection.fields if not requested_fields or field == 'id' or field in requested_fields)
+        limits = {identity: section_limit(name) for identity, name in identities.items()}
+        # One query for every product section: the first limit + 1 rows of each category by id
+        rank = func.row_number().over(partition_by=Product.category, order_by=Product.id).label('section_rank')
+        ranked = (
+            select(Product.category.label('section'), *(Product.__table__.c[field] for field in fields), rank)
+            .where(Product.category.in_(limits))
+            .subquery()
+        )
+        rows = db.session.execute(
+            select(ranked)
+            .where(ranked.c.section_rank <= case({identity: limit + 1 for identity, limit in limits.items()}, value=ranked.c.section))
+            .order_by(ranked.c.section, ranked.c.section_rank)
+        ).all()
+        grouped = {identity: [] for identity in identities}
+        for row in rows:
+            grouped[row.section].append(row)
+        for identity, name in identities.items():
+            first_rows(name, grouped[identity], limits[identity], fields, catalog, cursors)
+
+    if 'gallery' in sections:
+        fields = tuple(field for field in Gallery.projection.fields if not requested_fields or field == 'id' or field in requested_fields)
+        limit = section_limit('gallery')
+        columns = [Gallery.__table__.c[field] for field in fields]
+        rows = db.session.execute(select(*columns).order_by(Gallery.id).limit(limit + 1)).all()
+        first_rows('gallery', rows, limit, fields, catalog, cursors)
+
+    # A section's cursor continues it through its own endpoint, e.g. /beamblocks?after=<cursor>
+    return {"sections": catalog, "cursors": cursors}, None
+
+class Catalog(Resource):
+    def get(self):
+        available = [*CATALOG_SECTIONS, 'gallery']
+        sections = [name for name in request.args.get('sections', '').split(',') if name] or available
+        unknown = [name for name in sections if name not in available]
+        if unknown:
+            return make_response(jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400)
+        requested_fields = {field for field in request.args.get('fields', '').split(',') if field}
+        unknown = requested_fields - {*Product.projection.fields, *Gallery.projection.fields}
+        if unknown:
+            return make_response(jsonify({"error": f"Unknown fields: {', '.join(sorted(unknown))}"}), 400)
+        return cached_json_response(
+            {Product.__table__.name, Gallery.__table__.name},
+            lambda: build_catalog(sections, requested_fields),
+        )
+
+def register(app, api):
+    app.add_url_rule('/cache/stats', view_func=cache_stats, methods=['GET'])
+    app.add_url_rule('/images/<path:filename>', view_func=image_file)
+    api.add_resource(ProductResource, '/products')
+    api.add_resource(BeamBlocks, '/beamblocks')
+    api.add_resource(HollowBlocks, '/hollowblocks')
+    api.add_resource(PavingBlocks, '/pavingblocks')
+    api.add_resource(RoadKerbs, '/roadkerbs')
+    api.add_resource(Services, '/services')
+    api.add_resource(Search, '/search')
+    api.add_resource(GalleryResource, '/gallery')
+    api.add_resource(Catalog, '/catalog')
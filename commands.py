@@ -0,0 +1,164 @@
+from flask import current_app
+from flask.cli import with_appcontext
+import os
+import time
+import click
+from extensions import password_hasher
+from idempotency import purge_expired
+from images import InvalidImage, ingest_image
+from jobs import purge_finished
+from models import db, Product, Gallery, rebuild_daily_rollup
+
+# `flask db`, resolved to Flask-Migrate's command group only when it runs: Flask-Migrate pulls in
+# Alembic, our slowest import, which servers and every other command can do without
+class MigrateCommand(click.Group):
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_group
+        app = current_app._get_current_object()
+        if 'migrate' not in app.extensions:
+            Migrate(app, db)
+        return db_group.make_context(info_name, args, parent=parent, **extra)
+
+@click.command('rebuild-rollup')
+@with_appcontext
+def rebuild_rollup_command():
+    """Recompute order_daily_rollup from orders and order_products."""
+    with db.engine.begin() as connection:
+        rebuild_daily_rollup(connection)
+    print("Rebuilt order_daily_rollup")
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Delete stored Idempotency-Key responses older than IDEMPOTENCY_KEY_TTL; run it from cron."""
+    with db.engine.begin() as connection:
+        purged = purge_expired(connection, current_app.config['IDEMPOTENCY_KEY_TTL'])
+    print(f"Purged {purged} expired idempotency keys")
+
+@click.group('jobs')
+def jobs_group():
+    """Run and maintain the background job queue."""
+
+@jobs_group.command('work')
+@click.option('--workers', type=int, default=2, show_default=True, help='Worker threads.')
+@with_appcontext
+def jobs_work_command(workers):
+    """Process queued jobs until interrupted; pair it with JOB_WORKERS=0 in the web processes."""
+    queue = current_app.extensions['job_queue']
+    queue.start(workers)
+    print(f"Processing jobs with {workers} workers, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        # Jobs still running are handed to another worker once their visibility timeout lapses
+        queue.stop(timeout=5)
+
+@jobs_group.command('status')
+@with_appcontext
+def jobs_status_command():
+    """Show job counts by status."""
+    counts = current_app.extensions['job_queue'].counts()
+    if not counts:
+        print("No jobs")
+    for status, count in sorted(counts.items()):
+        print(f"{status}: {count}")
+
+@jobs_group.command('purge')
+@click.option('--older-than', type=float, help='Seconds since finishing; defaults to JOB_RETENTION.')
+@with_appcontext
+def jobs_purge_command(older_than):
+    """Delete done and failed jobs that finished longer ago than the retention period."""
+    with db.engine.begin() as connection:
+        purged = purge_finished(connection, older_than if older_than is not None else current_app.config['JOB_RETENTION'])
+    print(f"Purged {purged} finished jobs")
+
+@click.command('ingest-images')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+@with_appcontext
+def ingest_images_command(paths):
+    """Add image files to the gallery, or with no paths, ingest products' and gallery's local static images."""
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as f:
+                image_url, image_srcset = ingest_image(f.read(), current_app.config['IMAGE_DIR'])
+            db.session.add(Gallery(image_url=image_url, image_srcset=image_srcset))
+            print(f"{path} -> {image_url}")
+        db.session.commit()
+        return
+
+    ingested = {}
+    for model in (Product, Gallery):
+        for item in model.query.filter(model.image_url.is_not(None), model.image_srcset.is_(None)):
+            relative = item.image_url.lstrip('/')
+            if not relative.startswith('static/'):
+                continue
+            path = os.path.join(current_app.root_path, relative)
+            if not os.path.isfile(path):
+                print(f"Skipping {item!r}: {path} not found")
+                continue
+            if path not in ingested:
+                try:
+                    with open(path, 'rb') as f:
+                        ingested[path] = ingest_image(f.read(), current_app.config['IMAGE_DIR'])
+                except InvalidImage as e:
+                    print(f"Skipping {item!r}: {e}")
+                    continue
+            item.image_url, item.image_srcset = ingested[path]
+            print(f"{item!r} -> {item.image_url}")
+    db.session.commit()
+
+@click.command('seed')
+@click.option('--users', type=int, default=0, help='Synthetic users to generate; with --orders, replaces the demo data.')
+@click.option('--orders', type=int, default=0, help='Synthetic orders to generate.')
+@click.option('--products', type=int, default=500, show_default=True)
+@click.option('--lines-per-order', type=int, default=4, show_default=True, help='Average order lines per order.')
+@click.option('--seed', 'seed_value', type=int, default=1, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--passwords', type=int, default=1, show_default=True, help='Distinct passwords (password0, password1, ...) across synthetic users.')
+@click.option('--chunk-size', type=int, default=10_000, show_default=True)
+@click.option('--keep', is_flag=True, help='Append to the existing data instead of truncating first.')
+@with_appcontext
+def seed_command(users, orders, products, lines_per_order, seed_value, passwords, chunk_size, keep):
+    """Truncate the database and load demo data, or synthetic data at the given scale."""
+    from seed import hash_passwords, seed_demo, seed_synthetic, truncate_data
+
+    started = time.perf_counter()
+    connection = db.session.connection()
+    if not keep:
+        truncate_data(connection)
+        print(f"Truncated tables in {time.perf_counter() - started:.1f}s")
+
+    if users or orders:
+        if users < 1:
+            raise click.BadParameter('at least one user is needed to own the orders', param_hint='--users')
+        plain = ['password'] if passwords <= 1 else [f'password{i}' for i in range(passwords)]
+        password_hashes = hash_passwords(plain, password_hasher)
+        inserted = {}
+
+        def progress(table, rows):
+            inserted[table] = inserted.get(table, 0) + rows
+            total = sum(inserted.values())
+            elapsed = time.perf_counter() - started
+            print(f"  {table}: {inserted[table]} rows ({total / elapsed:,.0f} rows/s overall)")
+
+        counts = seed_synthetic(connection, users, orders, password_hashes, products=products,
+                                lines_per_order=lines_per_order, seed=seed_value, chunk_size=chunk_size, progress=progress)
+        # Core inserts bypass the ORM flush hook that maintains the rollup
+        rebuild_daily_rollup(connection)
+    else:
+        counts = seed_demo(db.session, password_hasher.generate_password_hash('password'))
+    db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(f"Seeded {', '.join(f'{count} {table}' for table, count in counts.items())}")
+    print(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s)")
+
+def register(app, api):
+    app.cli.add_command(MigrateCommand('db', help='Perform database migrations.'))
+    app.cli.add_command(rebuild_rollup_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(jobs_group)
+    app.cli.add_command(ingest_images_command)
+    app.cli.add_command(seed_command)
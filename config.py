@@ -0,0 +1,72 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def env_flag(variable, default):
+    return os.environ.get(variable, default).lower() in ('1', 'true', 'yes')
+
+# Database settings from the environment, defaulting to the local SQLite file
+def database_url():
+    url = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
+    # Hosted Postgres providers still hand out the scheme SQLAlchemy dropped
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+def engine_options():
+    options = {}
+    for option, variable, cast in (
+        ('pool_size', 'DB_POOL_SIZE', int),
+        ('max_overflow', 'DB_MAX_OVERFLOW', int),
+        ('pool_recycle', 'DB_POOL_RECYCLE', int),
+        ('pool_timeout', 'DB_POOL_TIMEOUT', int),
+    ):
+        if os.environ.get(variable):
+            options[option] = cast(os.environ[variable])
+    options['pool_pre_ping'] = env_flag('DB_POOL_PRE_PING', 'true')
+    return options
+
+# Settings read from the environment when the app is created; create_app(config) overrides any of them
+def from_environment():
+    return {
+        'SQLALCHEMY_DATABASE_URI': database_url(),
+        'SQLALCHEMY_ENGINE_OPTIONS': engine_options(),
+        'SQLITE_BUSY_TIMEOUT': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'SQLITE_MMAP_SIZE': int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'JWT_SECRET_KEY': os.environ.get('JWT_SECRET_KEY', 'super-secret'),
+        'BCRYPT_LOG_ROUNDS': int(os.environ.get('BCRYPT_LOG_ROUNDS', 12)),
+        'PASSWORD_HASH_WORKERS': int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+        'PASSWORD_HASH_MAX_PENDING': int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32)),
+        'IDENTITY_CACHE_SIZE': int(os.environ.get('IDENTITY_CACHE_SIZE', 10000)),
+        'IDENTITY_CACHE_TTL': float(os.environ.get('IDENTITY_CACHE_TTL', 300)),
+        'CATALOG_CACHE_SIZE': int(os.environ.get('CATALOG_CACHE_SIZE', 1024)),
+        'CATALOG_CACHE_TTL': float(os.environ.get('CATALOG_CACHE_TTL', 60)),
+        'PRICE_INDEX_TTL': float(os.environ.get('PRICE_INDEX_TTL', 30)),
+        # How long a POST /orders response is replayed for retries with the same Idempotency-Key
+        'IDEMPOTENCY_KEY_TTL': float(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)),
+        # Job worker threads per web process, started by its first request; 0 leaves jobs to `flask jobs work`.
+        # None means 1, or 0 for TESTING apps, which run jobs explicitly
+        'JOB_WORKERS': int(os.environ['JOB_WORKERS']) if os.environ.get('JOB_WORKERS') else None,
+        'JOB_POLL_INTERVAL': float(os.environ.get('JOB_POLL_INTERVAL', 1)),
+        'JOB_VISIBILITY_TIMEOUT': float(os.environ.get('JOB_VISIBILITY_TIMEOUT', 60)),
+        'JOB_BACKOFF_BASE': float(os.environ.get('JOB_BACKOFF_BASE', 2)),
+        'JOB_BACKOFF_MAX': float(os.environ.get('JOB_BACKOFF_MAX', 300)),
+        'JOB_RETENTION': float(os.environ.get('JOB_RETENTION', 7 * 24 * 60 * 60)),
+        # Any gateway accepting {"to": ..., "message": ...} JSON; unset logs messages instead
+        'SMS_WEBHOOK_URL': os.environ.get('SMS_WEBHOOK_URL'),
+        'SMS_WEBHOOK_TIMEOUT': float(os.environ.get('SMS_WEBHOOK_TIMEOUT', 10)),
+        # None means static/images under the app's root path
+        'IMAGE_DIR': os.environ.get('IMAGE_DIR'),
+        'MAX_CONTENT_LENGTH': int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)),
+        'COMPRESS_MIN_SIZE': int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        'COMPRESS_GZIP_LEVEL': int(os.environ.get('COMPRESS_GZIP_LEVEL', 6)),
+        'COMPRESS_BROTLI_QUALITY': int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5)),
+        'REQUEST_METRICS': env_flag('REQUEST_METRICS', 'false'),
+        'METRICS_TOKEN': os.environ.get('METRICS_TOKEN'),
+        'PROFILE_DIR': os.environ.get('PROFILE_DIR'),
+        'PROFILE_SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        'PROFILE_SLOW_MS': float(os.environ.get('PROFILE_SLOW_MS', 500)),
+    }
@@ -0,0 +1,37 @@
+from flask import current_app
+from werkzeug.local import LocalProxy
+from cache import TTLCache, track_writes, track_instances
+from hashing import PasswordHasher
+from pricing import PriceIndex
+from models import User, Product
+
+# Per-app services, stored in app.extensions so every app (and test) gets its own;
+# the proxies below resolve to the current app's instance
+def init_services(app):
+    password_hasher = PasswordHasher(
+        rounds=app.config['BCRYPT_LOG_ROUNDS'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+    )
+    catalog_cache = TTLCache(maxsize=app.config['CATALOG_CACHE_SIZE'], ttl=app.config['CATALOG_CACHE_TTL'])
+    price_index = PriceIndex(Product, ttl=app.config['PRICE_INDEX_TTL'])
+    track_writes(catalog_cache.invalidate, price_index.invalidate)
+
+    # user_id -> role, revoked when a user is updated or deleted
+    identity_cache = TTLCache(maxsize=app.config['IDENTITY_CACHE_SIZE'], ttl=app.config['IDENTITY_CACHE_TTL'])
+    track_instances(identity_cache, User, lambda user: user.user_id)
+
+    app.extensions.update(
+        password_hasher=password_hasher,
+        catalog_cache=catalog_cache,
+        price_index=price_index,
+        identity_cache=identity_cache,
+    )
+
+def _service(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+password_hasher = _service('password_hasher')
+catalog_cache = _service('catalog_cache')
+price_index = _service('price_index')
+identity_cache = _service('identity_cache')
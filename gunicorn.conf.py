@@ -0,0 +1,26 @@
+# Production runner for either entry point:
+#   gunicorn -c gunicorn.conf.py 'app:create_app()'           WSGI, threaded sync workers
+#   SERVER_MODE=asgi gunicorn -c gunicorn.conf.py asgi:app    ASGI, uvicorn event-loop workers
+import multiprocessing
+import os
+
+mode = os.environ.get('SERVER_MODE', 'wsgi')
+
+bind = os.environ.get('BIND', '0.0.0.0:5555')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+if mode == 'asgi':
+    # One event loop per worker; concurrency comes from awaiting I/O, not threads
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Keep connections open between a browser's requests, a little longer than a typical idle gap
+keepalive = int(os.environ.get('KEEP_ALIVE', 5))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+# Recycle workers periodically so slow leaks can't accumulate; jitter avoids restarting them together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
@@ -0,0 +1,46 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import make_response, jsonify
+from sqlalchemy import delete, select
+from models import db, IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+# Identifies the request a key was first used with; key order and whitespace don't matter
+def request_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def key_error(key):
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return make_response(jsonify({"error": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"}), 400)
+    return None
+
+# The live entry for (user_id, key), or None; an expired entry is deleted so the key can be reused
+def find_response(user_id, key, ttl):
+    entry = db.session.scalars(select(IdempotencyKey).filter_by(user_id=user_id, key=key)).first()
+    if entry is not None and entry.created_at < datetime.utcnow() - timedelta(seconds=ttl):
+        db.session.delete(entry)
+        db.session.flush()
+        return None
+    return entry
+
+def replay_response(entry, fingerprint):
+    if entry.request_hash != fingerprint:
+        return make_response(jsonify({"error": "Idempotency-Key was already used for a different request"}), 422)
+    response = make_response(entry.response_body, entry.status_code, {"Content-Type": "application/json"})
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def store_response(user_id, key, fingerprint, response):
+    db.session.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=fingerprint,
+        status_code=response.status_code,
+        response_body=response.get_data(as_text=True),
+    ))
+
+def purge_expired(connection, ttl):
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    return connection.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < cutoff)).rowcount
@@ -0,0 +1,74 @@
+import hashlib
+import io
+import os
+import tempfile
+
+# Widths generated for srcset, and the formats each width is written in
+VARIANT_WIDTHS = (320, 640, 1280)
+VARIANT_FORMATS = (
+    ('image/webp', 'WEBP', 'webp'),
+    ('image/jpeg', 'JPEG', 'jpg'),
+)
+ORIGINAL_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+class InvalidImage(ValueError):
+    pass
+
+# Readers only ever see complete files: write(f) fills a temp file unique to this call, which
+# then replaces `path`, so concurrent ingests of the same image never share a half-written file
+def _write_atomically(path, write):
+    directory, name = os.path.split(path)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f'.{name}.', suffix='.tmp', delete=False) as f:
+        try:
+            write(f)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+def _save(image, path, format):
+    # Content-hashed names never change meaning, so an existing file is already correct
+    if os.path.exists(path):
+        return
+    if format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    _write_atomically(path, lambda f: image.save(f, format=format, quality=82, optimize=True))
+
+# Store an image under its content hash plus resized variants; returns (image_url, {mime type: srcset})
+def ingest_image(data, image_dir, url_prefix='/images'):
+    # Pillow is imported on first use, so processes that never receive an image don't load it
+    from PIL import Image, UnidentifiedImageError
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImage("Upload is not a supported image") from e
+    except Image.DecompressionBombError as e:
+        # More pixels than Image.MAX_IMAGE_PIXELS allows, e.g. a tiny file claiming huge dimensions
+        raise InvalidImage("Image dimensions are too large") from e
+    extension = ORIGINAL_EXTENSIONS.get(image.format)
+    if extension is None:
+        raise InvalidImage(f"Unsupported image format {image.format}")
+
+    os.makedirs(image_dir, exist_ok=True)
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    original_name = f'{digest}.{extension}'
+    original_path = os.path.join(image_dir, original_name)
+    if not os.path.exists(original_path):
+        _write_atomically(original_path, lambda f: f.write(data))
+
+    # Never upscale: widths past the original collapse to the original width
+    widths = sorted({min(width, image.width) for width in VARIANT_WIDTHS})
+    srcset = {}
+    for mime_type, format, variant_extension in VARIANT_FORMATS:
+        entries = []
+        for width in widths:
+            name = f'{digest}-{width}.{variant_extension}'
+            height = max(1, round(image.height * width / image.width))
+            path = os.path.join(image_dir, name)
+            if not os.path.exists(path):
+                _save(image.resize((width, height), Image.LANCZOS), path, format)
+            entries.append(f'{url_prefix}/{name} {width}w')
+        srcset[mime_type] = ', '.join(entries)
+    return f'{url_prefix}/{original_name}', srcset
@@ -0,0 +1,186 @@
+import random
+import threading
+import traceback
+import weakref
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from models import db, Job
+
+# Registered background tasks by name; handlers enqueue them by name with JSON-serializable kwargs
+TASKS = {}
+
+def task(name):
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+# Add a job to `session` (the request's db.session, or an AsyncSession), so it commits with the
+# handler's own writes and workers never see a job for a transaction that rolled back
+def enqueue(session, task_name, max_attempts=5, delay=0, **payload):
+    if task_name not in TASKS:
+        raise KeyError(f"Unknown task {task_name}")
+    job = Job(
+        task=task_name,
+        payload=payload,
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    session.add(job)
+    session.info['jobs_enqueued'] = True
+    return job
+
+# Started queues in this process, woken as soon as a transaction with new jobs commits
+_queues = weakref.WeakSet()
+
+@event.listens_for(Session, 'after_commit')
+def wake_queues(session):
+    if session.info.pop('jobs_enqueued', False):
+        for queue in list(_queues):
+            queue.wake()
+
+@event.listens_for(Session, 'after_rollback')
+def forget_jobs(session):
+    session.info.pop('jobs_enqueued', None)
+
+def runnable(now):
+    # Due jobs, and running jobs whose worker let the visibility timeout lapse (it likely died)
+    return or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.locked_until < now),
+    )
+
+# Durable job queue on the jobs table: worker threads claim one job at a time, retry failures with
+# exponential backoff, and hold each job for visibility_timeout seconds. Delivery is at least once,
+# so tasks must tolerate running twice.
+class JobQueue:
+    def __init__(self, app=None, workers=1, poll_interval=1.0, visibility_timeout=60, backoff_base=2,
+                 backoff_max=300):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+        # In-process workers start with the first request, so CLI commands never run them
+        if self.workers:
+            app.before_request(self.start)
+
+    def start(self, workers=None):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for i in range(self.workers if workers is None else workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            _queues.add(self)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        _queues.discard(self)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                self.app.logger.exception("Job worker failed to claim a job")
+                ran = False
+            if not ran:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    # Claim and run one job; returns False when none was runnable
+    def run_once(self):
+        with self.app.app_context():
+            claimed = self._claim()
+            if claimed is None:
+                return False
+            try:
+                TASKS[claimed.task](**claimed.payload)
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.warning("Job %s (%s) attempt %s failed: %s", claimed.id, claimed.task, claimed.attempts, e)
+                self._fail(claimed.id, claimed.attempts, claimed.max_attempts, traceback.format_exc())
+            else:
+                db.session.commit()
+                self._finish(claimed.id, claimed.attempts, status='done', finished_at=datetime.utcnow(), last_error=None)
+            return True
+
+    def _claim(self):
+        now = datetime.utcnow()
+        # Idle polls stay read-only, so they never queue for SQLite's write lock behind requests
+        with db.engine.connect() as connection:
+            if connection.execute(select(Job.id).where(runnable(now)).limit(1)).first() is None:
+                return None
+        # One statement, so there is no read-then-write window; racing workers re-check the runnable
+        # condition on the row they update, and on PostgreSQL skip rows another worker has locked
+        candidate = (
+            select(Job.id).where(runnable(now)).order_by(Job.run_at).limit(1)
+            .with_for_update(skip_locked=True).scalar_subquery()
+        )
+        with db.engine.begin() as connection:
+            row = connection.execute(
+                update(Job)
+                .where(Job.id == candidate, runnable(now))
+                .values(status='running', attempts=Job.attempts + 1,
+                        locked_until=now + timedelta(seconds=self.visibility_timeout))
+                .returning(Job.id, Job.task, Job.payload, Job.attempts, Job.max_attempts)
+            ).first()
+        if row is None:
+            return None
+        if row.task not in TASKS:
+            self._finish(row.id, row.attempts, status='failed', finished_at=now, last_error=f"Unknown task {row.task}")
+            return None
+        return row
+
+    def _fail(self, job_id, attempts, max_attempts, error):
+        if attempts >= max_attempts:
+            self._finish(job_id, attempts, status='failed', finished_at=datetime.utcnow(), last_error=error)
+            return
+        # Exponential backoff with jitter, so a failing dependency isn't retried in lockstep
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+        self._finish(job_id, attempts, status='queued', run_at=datetime.utcnow() + timedelta(seconds=delay),
+                     last_error=error)
+
+    def _finish(self, job_id, attempts, **values):
+        # Matching attempts means this worker still owns the job, not one that reclaimed it
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.attempts == attempts, Job.status == 'running')
+                .values(locked_until=None, **values)
+            )
+
+    def counts(self):
+        with self.app.app_context():
+            return dict(db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all())
+
+def purge_finished(connection, older_than):
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    return connection.execute(
+        delete(Job).where(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff)
+    ).rowcount
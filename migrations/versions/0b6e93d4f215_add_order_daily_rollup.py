@@ -0,0 +1,45 @@
+"""add order daily rollup
+
+Revision ID: 0b6e93d4f215
+Revises: f1a4c8d2b703
+Create Date: 2026-10-18 16:48:53.077214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e93d4f215'
+down_revision = 'f1a4c8d2b703'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_daily_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=20), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('line_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'product_id')
+    )
+    op.create_index('ix_order_daily_rollup_category_day', 'order_daily_rollup', ['category', 'day'], unique=False)
+
+    # Backfill from existing orders
+    op.execute(
+        "INSERT INTO order_daily_rollup (day, product_id, category, quantity, line_count, revenue) "
+        "SELECT date(orders.order_date), order_products.product_id, products.category, "
+        "sum(order_products.quantity), count(*), sum(coalesce(order_products.subtotal, 0)) "
+        "FROM order_products "
+        "JOIN orders ON orders.id = order_products.order_id "
+        "JOIN products ON products.id = order_products.product_id "
+        "GROUP BY date(orders.order_date), order_products.product_id, products.category"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_order_daily_rollup_category_day', table_name='order_daily_rollup')
+    op.drop_table('order_daily_rollup')
@@ -0,0 +1,32 @@
+"""add image srcset
+
+Revision ID: 3a7d52c9e810
+Revises: 0b6e93d4f215
+Create Date: 2026-10-18 16:42:11.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7d52c9e810'
+down_revision = '0b6e93d4f215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('gallery', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_srcset', sa.JSON(), nullable=True))
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_srcset', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('image_srcset')
+
+    with op.batch_alter_table('gallery', schema=None) as batch_op:
+        batch_op.drop_column('image_srcset')
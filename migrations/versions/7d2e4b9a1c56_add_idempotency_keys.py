@@ -0,0 +1,37 @@
+"""add idempotency keys
+
+Revision ID: 7d2e4b9a1c56
+Revises: 3a7d52c9e810
+Create Date: 2026-10-18 20:05:12.481937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4b9a1c56'
+down_revision = '3a7d52c9e810'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('idempotency_keys',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('request_hash', sa.String(length=64), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('response_body', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_idempotency_keys_created_at', 'idempotency_keys', ['created_at'], unique=False)
+    op.create_index('ix_idempotency_keys_user_id_key', 'idempotency_keys', ['user_id', 'key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_user_id_key', table_name='idempotency_keys')
+    op.drop_index('ix_idempotency_keys_created_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,42 @@
+"""add order lookup indexes
+
+Revision ID: 8c4f1e2a7b93
+Revises: 39192eba433f
+Create Date: 2026-10-18 09:12:44.120931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f1e2a7b93'
+down_revision = '39192eba433f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_products_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_products_beamblock_id'), ['beamblock_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_products_hollowblock_id'), ['hollowblock_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_products_pavingblock_id'), ['pavingblock_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_products_roadkerb_id'), ['roadkerb_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_products_service_id'), ['service_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_products_service_id'))
+        batch_op.drop_index(batch_op.f('ix_order_products_roadkerb_id'))
+        batch_op.drop_index(batch_op.f('ix_order_products_pavingblock_id'))
+        batch_op.drop_index(batch_op.f('ix_order_products_hollowblock_id'))
+        batch_op.drop_index(batch_op.f('ix_order_products_beamblock_id'))
+        batch_op.drop_index(batch_op.f('ix_order_products_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_user_id_order_date')
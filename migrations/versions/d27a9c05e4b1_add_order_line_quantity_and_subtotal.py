@@ -0,0 +1,28 @@
+"""add order line quantity and subtotal
+
+Revision ID: d27a9c05e4b1
+Revises: 8c4f1e2a7b93
+Create Date: 2026-10-18 11:40:02.518337
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd27a9c05e4b1'
+down_revision = '8c4f1e2a7b93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('quantity', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('subtotal', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.drop_column('subtotal')
+        batch_op.drop_column('quantity')
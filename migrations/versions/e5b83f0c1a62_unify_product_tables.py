@@ -0,0 +1,177 @@
+"""unify product tables
+
+Revision ID: e5b83f0c1a62
+Revises: d27a9c05e4b1
+Create Date: 2026-10-18 14:05:37.904112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b83f0c1a62'
+down_revision = 'd27a9c05e4b1'
+branch_labels = None
+depends_on = None
+
+# category -> legacy table; the legacy foreign key on order_products is <category>_id
+LEGACY_TABLES = {
+    'beamblock': 'beamblocks',
+    'hollowblock': 'hollowblocks',
+    'pavingblock': 'pavingblocks',
+    'roadkerb': 'roadkerbs',
+    'service': 'services',
+}
+
+products = sa.table(
+    'products',
+    sa.column('id', sa.Integer),
+    sa.column('category', sa.String),
+    sa.column('price', sa.Float),
+    sa.column('image_url', sa.String),
+    sa.column('description', sa.Text),
+)
+
+order_products = sa.table(
+    'order_products',
+    sa.column('id', sa.Integer),
+    sa.column('order_id', sa.Integer),
+    sa.column('product_id', sa.Integer),
+    sa.column('quantity', sa.Integer),
+    sa.column('subtotal', sa.Float),
+    *(sa.column(f'{category}_id', sa.Integer) for category in LEGACY_TABLES),
+)
+
+
+def legacy_table(name):
+    return sa.table(
+        name,
+        sa.column('id', sa.Integer),
+        sa.column('price', sa.Float),
+        sa.column('image_url', sa.String),
+        sa.column('description', sa.Text),
+    )
+
+
+def upgrade():
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=20), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('image_url', sa.String(length=200), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_products_category_id', 'products', ['category', 'id'], unique=False)
+
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+
+    conn = op.get_bind()
+
+    # Legacy ids overlap between tables, so every product gets a new id
+    new_ids = {}
+    prices = {}
+    next_id = 1
+    for category, name in LEGACY_TABLES.items():
+        table = legacy_table(name)
+        rows = conn.execute(sa.select(table).order_by(table.c.id)).all()
+        for row in rows:
+            new_ids[category, row.id] = next_id
+            prices[next_id] = row.price
+            next_id += 1
+        if rows:
+            conn.execute(products.insert(), [
+                {'id': new_ids[category, row.id], 'category': category, 'price': row.price,
+                 'image_url': row.image_url, 'description': row.description}
+                for row in rows
+            ])
+
+    # Each legacy line may name several products; it becomes one line per product
+    updates = []
+    inserts = []
+    orphans = []
+    for line in conn.execute(sa.select(order_products)).all():
+        product_ids = [
+            new_ids[category, getattr(line, f'{category}_id')]
+            for category in LEGACY_TABLES
+            if (category, getattr(line, f'{category}_id')) in new_ids
+        ]
+        if not product_ids:
+            orphans.append({'line_id': line.id})
+            continue
+        subtotals = [round(prices[product_id] * line.quantity, 2) for product_id in product_ids]
+        if len(product_ids) == 1 and line.subtotal is not None:
+            subtotals[0] = line.subtotal
+        updates.append({'line_id': line.id, 'product_id': product_ids[0], 'subtotal': subtotals[0]})
+        inserts.extend(
+            {'order_id': line.order_id, 'product_id': product_id, 'quantity': line.quantity, 'subtotal': subtotal}
+            for product_id, subtotal in zip(product_ids[1:], subtotals[1:])
+        )
+    if updates:
+        conn.execute(
+            order_products.update().where(order_products.c.id == sa.bindparam('line_id'))
+            .values(product_id=sa.bindparam('product_id'), subtotal=sa.bindparam('subtotal')),
+            updates,
+        )
+    if inserts:
+        conn.execute(order_products.insert(), inserts)
+    if orphans:
+        conn.execute(order_products.delete().where(order_products.c.id == sa.bindparam('line_id')), orphans)
+
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        for category, name in LEGACY_TABLES.items():
+            batch_op.drop_index(batch_op.f(f'ix_order_products_{category}_id'))
+            batch_op.drop_constraint(batch_op.f(f'fk_order_products_{category}_id_{name}'), type_='foreignkey')
+            batch_op.drop_column(f'{category}_id')
+        batch_op.alter_column('product_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_order_products_product_id'), ['product_id'], unique=False)
+        batch_op.create_foreign_key(batch_op.f('fk_order_products_product_id_products'), 'products', ['product_id'], ['id'])
+
+    for name in LEGACY_TABLES.values():
+        op.drop_table(name)
+
+
+def downgrade():
+    for name in LEGACY_TABLES.values():
+        op.create_table(name,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('image_url', sa.String(length=200), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    conn = op.get_bind()
+
+    # Product ids are unique across categories, so they can be kept as-is
+    for category, name in LEGACY_TABLES.items():
+        table = legacy_table(name)
+        conn.execute(table.insert().from_select(
+            ['id', 'price', 'image_url', 'description'],
+            sa.select(products.c.id, products.c.price, products.c.image_url, products.c.description)
+            .where(products.c.category == category),
+        ))
+
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        for category in LEGACY_TABLES:
+            batch_op.add_column(sa.Column(f'{category}_id', sa.Integer(), nullable=True))
+
+    for category in LEGACY_TABLES:
+        in_category = sa.select(products.c.id).where(products.c.category == category)
+        conn.execute(
+            order_products.update().where(order_products.c.product_id.in_(in_category))
+            .values({f'{category}_id': order_products.c.product_id})
+        )
+
+    with op.batch_alter_table('order_products', schema=None) as batch_op:
+        batch_op.drop_constraint(batch_op.f('fk_order_products_product_id_products'), type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_order_products_product_id'))
+        batch_op.drop_column('product_id')
+        for category, name in LEGACY_TABLES.items():
+            batch_op.create_index(batch_op.f(f'ix_order_products_{category}_id'), [f'{category}_id'], unique=False)
+            batch_op.create_foreign_key(batch_op.f(f'fk_order_products_{category}_id_{name}'), name, [f'{category}_id'], ['id'])
+
+    op.drop_index('ix_products_category_id', table_name='products')
+    op.drop_table('products')
@@ -0,0 +1,46 @@
+"""add product search index
+
+Revision ID: f1a4c8d2b703
+Revises: e5b83f0c1a62
+Create Date: 2026-10-18 15:22:11.630458
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a4c8d2b703'
+down_revision = 'e5b83f0c1a62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-specific; other backends fall back to substring matching in /search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE products_fts USING fts5(description, content='products', content_rowid='id')")
+    op.execute(
+        "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+        "INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER products_fts_update AFTER UPDATE OF description ON products BEGIN "
+        "INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+        "INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description); END"
+    )
+    op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS products_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_insert")
+    op.execute("DROP TABLE IF EXISTS products_fts")
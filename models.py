@@ -1,13 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
-from sqlalchemy.orm import relationship, validates
+from sqlalchemy import DDL, MetaData, event, inspect
+from sqlalchemy.orm import Session, relationship, validates, joinedload, selectinload
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy_serializer import SerializerMixin
+from collections import defaultdict
 from datetime import datetime
 import re
 
 # Metadata with naming conventions
 metadata = MetaData(
     naming_convention={
+        "ix": "ix_%(column_0_label)s",
         "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
     }
 )
@@ -42,86 +45,71 @@ class User(db.Model, SerializerMixin):
     def __repr__(self):
         return f'<User {self.user_id}, {self.user_name}, {self.email}>'
 
-# BeamBlock Model
-class BeamBlock(db.Model, SerializerMixin):
-    __tablename__ = 'beamblocks'
+# Product Model: one table for every catalog category, told apart by `category`
+class Product(db.Model, SerializerMixin):
+    __tablename__ = 'products'
+    # Keyset pages within a category walk this index
+    __table_args__ = (db.Index('ix_products_category_id', 'category', 'id'),)
     id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(20), nullable=False)
     price = db.Column(db.Float, nullable=False)
     image_url = db.Column(db.String(200), nullable=True)
+    # MIME type -> srcset of resized variants, written by images.ingest_image
+    image_srcset = db.Column(db.JSON, nullable=True)
     description = db.Column(db.Text, nullable=True)
 
-    order_beamblocks = db.relationship('OrderProduct', back_populates='beamblock')
-
-    serialize_rules = ('-order_beamblocks.beamblock',)
-
-    def __repr__(self):
-        return f'<BeamBlock id={self.id} price={self.price}>'
-
-# HollowBlock Model
-class HollowBlock(db.Model, SerializerMixin):
-    __tablename__ = 'hollowblocks'
-    id = db.Column(db.Integer, primary_key=True)
-    price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(200), nullable=True)
-    description = db.Column(db.Text, nullable=True)
+    order_lines = db.relationship('OrderProduct', back_populates='product')
 
-    order_hollowblocks = db.relationship('OrderProduct', back_populates='hollowblock')
+    serialize_rules = ('-order_lines.product',)
 
-    serialize_rules = ('-order_hollowblocks.hollowblock',)
+    __mapper_args__ = {'polymorphic_on': category}
 
     def __repr__(self):
-        return f'<HollowBlock id={self.id} price={self.price}>'
+        return f'<{type(self).__name__} id={self.id} price={self.price}>'
+
+# Full-text index over product descriptions, kept in sync by triggers (SQLite only;
+# migration f1a4c8d2b703 creates the same objects on existing databases)
+PRODUCT_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE products_fts USING fts5(description, content='products', content_rowid='id')",
+    "CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN "
+    "INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER products_fts_update AFTER UPDATE OF description ON products BEGIN "
+    "INSERT INTO products_fts(products_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO products_fts(rowid, description) VALUES (new.id, new.description); END",
+)
 
-# PavingBlock Model
-class PavingBlock(db.Model, SerializerMixin):
-    __tablename__ = 'pavingblocks'
-    id = db.Column(db.Integer, primary_key=True)
-    price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(200), nullable=True)
-    description = db.Column(db.Text, nullable=True)
+for _statement in PRODUCT_SEARCH_DDL:
+    event.listen(Product.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Product.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect='sqlite'))
 
-    order_pavingblocks = db.relationship('OrderProduct', back_populates='pavingblock')
+# BeamBlock Model
+class BeamBlock(Product):
+    __mapper_args__ = {'polymorphic_identity': 'beamblock'}
 
-    serialize_rules = ('-order_pavingblocks.pavingblock',)
+# HollowBlock Model
+class HollowBlock(Product):
+    __mapper_args__ = {'polymorphic_identity': 'hollowblock'}
 
-    def __repr__(self):
-        return f'<PavingBlock id={self.id} price={self.price}>'
+# PavingBlock Model
+class PavingBlock(Product):
+    __mapper_args__ = {'polymorphic_identity': 'pavingblock'}
 
 # RoadKerb Model
-class RoadKerb(db.Model, SerializerMixin):
-    __tablename__ = 'roadkerbs'
-    id = db.Column(db.Integer, primary_key=True)
-    price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(200), nullable=True)
-    description = db.Column(db.Text, nullable=True)
-
-    order_roadkerbs = db.relationship('OrderProduct', back_populates='roadkerb')
-
-    serialize_rules = ('-order_roadkerbs.roadkerb',)
-
-    def __repr__(self):
-        return f'<RoadKerb id={self.id} price={self.price}>'
+class RoadKerb(Product):
+    __mapper_args__ = {'polymorphic_identity': 'roadkerb'}
 
 # Service Model
-class Service(db.Model, SerializerMixin):
-    __tablename__ = 'services'
-    id = db.Column(db.Integer, primary_key=True)
-    price = db.Column(db.Float, nullable=False)
-    image_url = db.Column(db.String(200), nullable=True)
-    description = db.Column(db.Text, nullable=True)
-
-    order_services = db.relationship('OrderProduct', back_populates='service')
-
-    serialize_rules = ('-order_services.service',)
-
-    def __repr__(self):
-        return f'<Service id={self.id} price={self.price}>'
+class Service(Product):
+    __mapper_args__ = {'polymorphic_identity': 'service'}
 
 # Gallery Model
 class Gallery(db.Model, SerializerMixin):
     __tablename__ = 'gallery'
     id = db.Column(db.Integer, primary_key=True)
     image_url = db.Column(db.String(200), nullable=True)
+    image_srcset = db.Column(db.JSON, nullable=True)
 
     def __repr__(self):
         return f'<Gallery id={self.id}>'
@@ -129,6 +117,8 @@ class Gallery(db.Model, SerializerMixin):
 # Order Model
 class Order(db.Model, SerializerMixin):
     __tablename__ = 'orders'
+    # Leading user_id also serves plain user_id lookups
+    __table_args__ = (db.Index('ix_orders_user_id_order_date', 'user_id', 'order_date'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     order_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -146,22 +136,223 @@ class Order(db.Model, SerializerMixin):
 class OrderProduct(db.Model, SerializerMixin):
     __tablename__ = 'order_products'
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    beamblock_id = db.Column(db.Integer, db.ForeignKey('beamblocks.id'), nullable=True)
-    hollowblock_id = db.Column(db.Integer, db.ForeignKey('hollowblocks.id'), nullable=True)
-    pavingblock_id = db.Column(db.Integer, db.ForeignKey('pavingblocks.id'), nullable=True)
-    roadkerb_id = db.Column(db.Integer, db.ForeignKey('roadkerbs.id'), nullable=True)
-    service_id = db.Column(db.Integer, db.ForeignKey('services.id'), nullable=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    subtotal = db.Column(db.Float, nullable=True)
 
     order = db.relationship('Order', back_populates='order_products')
-    beamblock = db.relationship('BeamBlock', back_populates='order_beamblocks')
-    hollowblock = db.relationship('HollowBlock', back_populates='order_hollowblocks')
-    pavingblock = db.relationship('PavingBlock', back_populates='order_pavingblocks')
-    roadkerb = db.relationship('RoadKerb', back_populates='order_roadkerbs')
-    service = db.relationship('Service', back_populates='order_services')
+    product = db.relationship('Product', back_populates='order_lines')
+
+    serialize_rules = ('-order.order_products', '-product.order_lines')
+
+    def __repr__(self):
+        return f'<OrderProduct id={self.id} order_id={self.order_id}>'
+
+# OrderDailyRollup Model: per-day, per-product sales totals kept up to date as order lines are written
+class OrderDailyRollup(db.Model):
+    __tablename__ = 'order_daily_rollup'
+    __table_args__ = (db.Index('ix_order_daily_rollup_category_day', 'category', 'day'),)
+    day = db.Column(db.Date, primary_key=True)
+    # No foreign key, so sales history outlives deleted products
+    product_id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(20), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    line_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<OrderDailyRollup day={self.day} product_id={self.product_id} revenue={self.revenue}>'
 
-    serialize_rules = ('-order.order_products', '-beamblock.order_beamblocks', '-hollowblock.order_hollowblocks',
-                       '-pavingblock.order_pavingblocks', '-roadkerb.order_roadkerbs', '-service.order_services')
+# IdempotencyKey Model: the stored response to a request sent with an Idempotency-Key header
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    # Keys are scoped to the user, so one client can't replay another's response
+    __table_args__ = (db.Index('ix_idempotency_keys_user_id_key', 'user_id', 'key', unique=True),)
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: entries expire on their own and never block deleting a user
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response_body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<IdempotencyKey id={self.id} user_id={self.user_id} key={self.key!r}>'
+
+# Job Model: a queued call to a registered background task, see jobs.py
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    # Workers look for the oldest runnable job in a status
+    __table_args__ = (db.Index('ix_jobs_status_run_at', 'status', 'run_at'),)
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    # queued -> running -> done, or back to queued for a retry, or failed once attempts run out
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # A running job whose worker hasn't finished by then is handed to another worker
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
 
     def __repr__(self):
-        return f'<OrderProduct id={self.id} order_id={self.order_id}>'
\ No newline at end of file
+        return f'<Job id={self.id} task={self.task} status={self.status} attempts={self.attempts}>'
+
+def add_to_daily_rollup(connection, lines, sign=1):
+    # lines are (order_date, product_id, quantity, subtotal); one upsert covers the whole batch.
+    # sign=-1 takes deleted lines back out
+    totals = defaultdict(lambda: [0, 0, 0.0])
+    for order_date, product_id, quantity, subtotal in lines:
+        entry = totals[order_date.date(), product_id]
+        entry[0] += sign * quantity
+        entry[1] += sign
+        entry[2] += sign * (subtotal or 0)
+    if not totals:
+        return
+    categories = dict(connection.execute(
+        db.select(Product.id, Product.category).where(Product.id.in_({product_id for _, product_id in totals}))
+    ).all())
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    table = OrderDailyRollup.__table__
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.product_id],
+        set_={
+            'quantity': table.c.quantity + statement.excluded.quantity,
+            'line_count': table.c.line_count + statement.excluded.line_count,
+            'revenue': table.c.revenue + statement.excluded.revenue,
+        },
+    )
+    connection.execute(statement, [
+        {'day': day, 'product_id': product_id, 'category': categories.get(product_id, ''),
+         'quantity': quantity, 'line_count': line_count, 'revenue': round(revenue, 2)}
+        for (day, product_id), (quantity, line_count, revenue) in totals.items()
+    ])
+    if sign < 0:
+        # Days where a product no longer has any lines drop out of the reports entirely
+        connection.execute(db.delete(OrderDailyRollup).where(
+            OrderDailyRollup.line_count <= 0,
+            db.tuple_(OrderDailyRollup.day, OrderDailyRollup.product_id).in_(list(totals)),
+        ))
+
+def rebuild_daily_rollup(connection):
+    connection.execute(db.delete(OrderDailyRollup))
+    day = db.func.date(Order.order_date)
+    connection.execute(db.insert(OrderDailyRollup).from_select(
+        ['day', 'product_id', 'category', 'quantity', 'line_count', 'revenue'],
+        db.select(
+            day, OrderProduct.product_id, Product.category, db.func.sum(OrderProduct.quantity),
+            db.func.count(), db.func.sum(db.func.coalesce(OrderProduct.subtotal, 0)),
+        )
+        .select_from(OrderProduct)
+        .join(Order, Order.id == OrderProduct.order_id)
+        .join(Product, Product.id == OrderProduct.product_id)
+        .group_by(day, OrderProduct.product_id, Product.category)
+    ))
+
+# Deleted lines include those removed by cascade, e.g. with their order or with DELETE /users/<id>
+@event.listens_for(Session, 'after_flush')
+def roll_up_order_lines(session, flush_context):
+    for instances, sign in ((session.new, 1), (session.deleted, -1)):
+        lines = [
+            (line.order.order_date, line.product_id, line.quantity, line.subtotal)
+            for line in instances if isinstance(line, OrderProduct)
+        ]
+        if lines:
+            add_to_daily_rollup(session.connection(), lines, sign)
+
+# Column projection used by the hot read endpoints instead of SerializerMixin.to_dict()
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+class Projection:
+    def __init__(self, model, exclude=()):
+        self.model = model
+        self.columns = tuple(column for column in model.__table__.columns if column.key not in exclude)
+        self.fields = tuple(column.key for column in self.columns)
+        self.statement = db.select(*self.columns)
+        # Single-table subclasses only see their own category
+        mapper = inspect(model)
+        if mapper.single and mapper.polymorphic_identity is not None:
+            self.statement = self.statement.where(mapper.polymorphic_on == mapper.polymorphic_identity)
+        # Match the string format SerializerMixin uses for datetimes
+        self.converters = tuple(
+            (column.key, lambda value: value.strftime(DATETIME_FORMAT))
+            for column in self.columns if isinstance(column.type, db.DateTime)
+        )
+
+    def to_dicts(self, rows):
+        fields = self.fields
+        records = [dict(zip(fields, row)) for row in rows]
+        for field, convert in self.converters:
+            for record in records:
+                if record[field] is not None:
+                    record[field] = convert(record[field])
+        return records
+
+    def fetch(self, statement=None):
+        rows = db.session.execute(self.statement if statement is None else statement).all()
+        return self.to_dicts(rows)
+
+    def tables(self, names=()):
+        relationships = inspect(self.model).relationships
+        tables = {self.model.__table__.name}
+        tables.update(relationships[name].target.name for name in names if name in relationships)
+        return tables
+
+    def expand(self, records, names):
+        # Resolve each requested relationship with one IN query over the whole page
+        relationships = inspect(self.model).relationships
+        for name in names:
+            rel = relationships.get(name)
+            if rel is None or len(rel.local_remote_pairs) != 1:
+                continue
+            local, remote = rel.local_remote_pairs[0]
+            target = rel.mapper.class_.projection
+            keys = {record[local.key] for record in records if record.get(local.key) is not None}
+            related = target.fetch(target.statement.where(remote.in_(keys))) if keys else []
+            if rel.uselist:
+                grouped = defaultdict(list)
+                for item in related:
+                    grouped[item[remote.key]].append(item)
+                for record in records:
+                    record[name] = grouped.get(record.get(local.key), [])
+            else:
+                by_key = {item[remote.key]: item for item in related}
+                for record in records:
+                    record[name] = by_key.get(record.get(local.key))
+        return records
+
+User.projection = Projection(User, exclude=('password',))
+Product.projection = Projection(Product)
+BeamBlock.projection = Projection(BeamBlock)
+HollowBlock.projection = Projection(HollowBlock)
+PavingBlock.projection = Projection(PavingBlock)
+RoadKerb.projection = Projection(RoadKerb)
+Service.projection = Projection(Service)
+Gallery.projection = Projection(Gallery)
+Order.projection = Projection(Order)
+OrderProduct.projection = Projection(OrderProduct)
+
+# SQLite tuning applied to every new connection: WAL lets readers run alongside the writer
+def enable_sqlite_pragmas(engine, busy_timeout=5000, mmap_size=268435456):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.execute(f'PRAGMA mmap_size={int(mmap_size)}')
+        cursor.close()
+
+# Eager-loading options for order reads, so Order.to_dict() never lazy-loads per row
+def order_loader_options(collection_strategy=selectinload, reference_strategy=joinedload):
+    products = collection_strategy(Order.order_products).options(reference_strategy(OrderProduct.product))
+    return (reference_strategy(Order.user), products)
@@ -0,0 +1,13 @@
+from flask import current_app
+
+# Text messages go to SMS_WEBHOOK_URL, or to the app log when it isn't set. Raising lets the job
+# queue retry the send.
+def send_sms(to, message):
+    url = current_app.config['SMS_WEBHOOK_URL']
+    if not url:
+        current_app.logger.info("SMS to %s: %s", to, message)
+        return
+    # Imported on the first send, keeping it out of startup
+    import requests
+    response = requests.post(url, json={"to": to, "message": message}, timeout=current_app.config['SMS_WEBHOOK_TIMEOUT'])
+    response.raise_for_status()
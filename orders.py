@@ -0,0 +1,210 @@
+from flask import current_app, make_response, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_restful import Resource
+from datetime import datetime
+import json
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from auth import current_role
+from extensions import price_index
+from idempotency import find_response, key_error, replay_response, request_hash, store_response
+from jobs import enqueue, task
+from notifications import send_sms
+from pricing import InvalidOrderLine, normalize_order_lines
+from models import db, User, Product, Order, OrderProduct, order_loader_options, add_to_daily_rollup
+
+# Order Resource
+class Orders(Resource):
+    # One query for the orders, one for all of their lines with products joined in
+    loader_options = order_loader_options(collection_strategy=selectinload, reference_strategy=joinedload)
+
+    @jwt_required()
+    def get(self):
+        current_user_id = get_jwt_identity()
+        orders = Order.query.options(*self.loader_options).filter_by(user_id=current_user_id).all()
+        response = [order.to_dict() for order in orders]
+        return make_response(jsonify(response), 200)
+
+    @jwt_required()
+    def post(self):
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return make_response(jsonify({"error": "Malformed order data"}), 400)
+        current_user_id = get_jwt_identity()
+        # A retry with the same Idempotency-Key gets the first response back instead of a second order
+        key = request.headers.get('Idempotency-Key')
+        if key is not None:
+            error = key_error(key)
+            if error:
+                return error
+            fingerprint = request_hash(data)
+            entry = find_response(current_user_id, key, current_app.config['IDEMPOTENCY_KEY_TTL'])
+            if entry is not None:
+                return replay_response(entry, fingerprint)
+        # Prices come from the catalog, never from the client
+        try:
+            lines = normalize_order_lines(data.get('order_products'))
+            subtotals = price_index.price_lines(lines)
+        except InvalidOrderLine as e:
+            return make_response(jsonify({"error": str(e)}), 422)
+        new_order = Order(
+            user_id=current_user_id,
+            total_price=round(sum(subtotals), 2),
+            order_products=[
+                OrderProduct(product_id=line['product_id'], quantity=line['quantity'], subtotal=subtotal)
+                for line, subtotal in zip(lines, subtotals)
+            ]
+        )
+        db.session.add(new_order)
+        db.session.flush()
+        # Side effects run on a job worker once this commits, so they never add to checkout latency
+        enqueue(db.session, 'send_order_confirmation', order_id=new_order.id)
+        if key is None:
+            db.session.commit()
+            return make_response(jsonify(new_order.to_dict()), 201)
+
+        # The order and its stored response commit together, so a replay always matches a real order
+        response = make_response(jsonify(new_order.to_dict()), 201)
+        store_response(current_user_id, key, fingerprint, response)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request with the same key committed first; this order is discarded
+            db.session.rollback()
+            entry = find_response(current_user_id, key, current_app.config['IDEMPOTENCY_KEY_TTL'])
+            if entry is None:
+                raise
+            return replay_response(entry, fingerprint)
+        return response
+
+# Background tasks for new orders, enqueued in the same transaction by every endpoint that creates them
+@task('send_order_confirmation')
+def send_order_confirmation(order_id):
+    order = db.session.get(Order, order_id)
+    if order is None:
+        # Deleted before the job ran
+        return
+    send_sms(order.user.phone_number, f"Matrix: order #{order.id} received, total {order.total_price:.2f}")
+
+# Bulk Orders Resource
+MAX_BULK_ORDERS = 5000
+
+def read_bulk_orders():
+    # Accepts a JSON array, {"orders": [...]}, or one order per line as NDJSON
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    data = request.get_json()
+    return data.get('orders') if isinstance(data, dict) else data
+
+def parse_bulk_order(item, current_user_id, is_admin):
+    # Returns the normalized lines, or an error message for this item
+    if not isinstance(item, dict):
+        return None, "Order must be an object"
+    user_id = item.get('user_id', current_user_id)
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        return None, f"Invalid user_id {user_id!r}"
+    if user_id != current_user_id and not is_admin:
+        return None, "Admin access required to order for another user"
+    try:
+        return normalize_order_lines(item.get('order_products')), None
+    except InvalidOrderLine as e:
+        return None, str(e)
+
+def unknown_product_error(lines, categories):
+    for line in lines:
+        category = categories.get(line['product_id'])
+        if category is None or line['category'] not in (None, category):
+            return f"Unknown {line['key']} {line['product_id']}"
+    return None
+
+class BulkOrders(Resource):
+    @jwt_required()
+    def post(self):
+        try:
+            items = read_bulk_orders()
+        except ValueError:
+            return make_response(jsonify({"error": "Malformed order data"}), 400)
+        if not isinstance(items, list):
+            return make_response(jsonify({"error": "Expected a list of orders"}), 400)
+        if len(items) > MAX_BULK_ORDERS:
+            return make_response(jsonify({"error": f"At most {MAX_BULK_ORDERS} orders per request"}), 413)
+
+        current_user_id = get_jwt_identity()
+        is_admin = current_role() == 'admin'
+        parsed = [parse_bulk_order(item, current_user_id, is_admin) for item in items]
+
+        # Check every referenced product and user with one query each
+        product_ids = {line['product_id'] for lines, _ in parsed if lines is not None for line in lines}
+        user_ids = {item.get('user_id', current_user_id) for item, (lines, _) in zip(items, parsed) if lines is not None}
+        categories = dict(db.session.execute(
+            select(Product.id, Product.category).where(Product.id.in_(product_ids))
+        ).all())
+        known_users = set(db.session.scalars(
+            select(User.user_id).where(User.user_id.in_(user_ids))
+        ))
+
+        results = []
+        accepted = []
+        for index, (item, (lines, error)) in enumerate(zip(items, parsed)):
+            if error is None:
+                error = unknown_product_error(lines, categories)
+            if error is None and item.get('user_id', current_user_id) not in known_users:
+                error = f"Unknown user_id {item.get('user_id')}"
+            if error is None:
+                try:
+                    subtotals = price_index.price_lines(lines)
+                except InvalidOrderLine as e:
+                    error = str(e)
+            if error:
+                results.append({"index": index, "status": 422, "error": error})
+            else:
+                results.append({"index": index, "status": 201, "total_price": round(sum(subtotals), 2)})
+                accepted.append((results[-1], item, lines, subtotals))
+
+        if accepted:
+            order_date = datetime.utcnow()
+            order_ids = db.session.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True),
+                [{"user_id": item.get('user_id', current_user_id), "total_price": result["total_price"],
+                  "order_date": order_date} for result, item, _, _ in accepted],
+            ).all()
+            order_lines = [
+                {"order_id": order_id, "product_id": line['product_id'], "quantity": line['quantity'],
+                 "subtotal": subtotal}
+                for order_id, (_, _, lines, subtotals) in zip(order_ids, accepted)
+                for line, subtotal in zip(lines, subtotals)
+            ]
+            if order_lines:
+                db.session.execute(insert(OrderProduct), order_lines)
+                # Bulk inserts skip the flush hook that maintains the rollup
+                add_to_daily_rollup(db.session.connection(), [
+                    (order_date, line['product_id'], line['quantity'], line['subtotal']) for line in order_lines
+                ])
+            # Confirmations commit with the orders, as in Orders.post
+            for order_id in order_ids:
+                enqueue(db.session, 'send_order_confirmation', order_id=order_id)
+            db.session.commit()
+            for order_id, (result, _, _, _) in zip(order_ids, accepted):
+                result["id"] = order_id
+
+        status = 201 if len(accepted) == len(items) else 207
+        return make_response(jsonify({"results": results}), status)
+
+# OrderByID Resource
+class OrderByID(Resource):
+    # A single order is cheapest as one joined query
+    loader_options = order_loader_options(collection_strategy=joinedload, reference_strategy=joinedload)
+
+    @jwt_required()
+    def get(self, order_id):
+        current_user_id = get_jwt_identity()
+        order = Order.query.options(*self.loader_options).filter_by(id=order_id).first_or_404()
+        if order.user_id != current_user_id:
+            return make_response(jsonify({"error": "Access denied"}), 403)
+        return make_response(jsonify(order.to_dict()), 200)
+
+def register(app, api):
+    api.add_resource(Orders, '/orders')
+    api.add_resource(BulkOrders, '/orders/bulk')
+    api.add_resource(OrderByID, '/orders/<int:order_id>')
@@ -0,0 +1,85 @@
+import math
+import threading
+import time
+from array import array
+from sqlalchemy import inspect
+from models import db, Product
+
+class InvalidOrderLine(ValueError):
+    pass
+
+# Order lines may still name a product by its category, e.g. {"beamblock_id": 3}
+CATEGORY_KEYS = {f'{category}_id': category for category in inspect(Product).polymorphic_map}
+
+def normalize_order_lines(lines):
+    if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+        raise InvalidOrderLine("order_products must be a list of objects")
+    if not lines:
+        raise InvalidOrderLine("An order needs at least one line")
+    normalized = []
+    for line in lines:
+        quantity = line.get('quantity', 1)
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            raise InvalidOrderLine("quantity must be a positive integer")
+        references = [('product_id', None)] + list(CATEGORY_KEYS.items())
+        keys = [(key, category) for key, category in references if line.get(key) is not None]
+        if not keys:
+            raise InvalidOrderLine("Each order line needs a product_id")
+        # A legacy line naming several categories becomes one line per product
+        for key, category in keys:
+            product_id = line[key]
+            if not isinstance(product_id, int) or isinstance(product_id, bool):
+                raise InvalidOrderLine(f"Invalid {key} {product_id!r}")
+            normalized.append({'key': key, 'category': category, 'product_id': product_id, 'quantity': quantity})
+    return normalized
+
+# Compact id -> price array over the products table, so pricing an order needs no queries
+class PriceIndex:
+    def __init__(self, model=Product, ttl=30):
+        self.model = model
+        self.ttl = ttl
+        self.tables = {model.__table__.name}
+        self._prices = array('d')
+        self._categories = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self, tables):
+        if self.tables & set(tables):
+            self._loaded_at = None
+
+    def _load(self):
+        rows = db.session.execute(db.select(self.model.id, self.model.price, self.model.category)).all()
+        size = max((row.id for row in rows), default=0) + 1
+        # NaN marks ids with no product
+        prices = array('d', [math.nan]) * size
+        categories = [None] * size
+        for row in rows:
+            prices[row.id] = row.price
+            categories[row.id] = row.category
+        self._prices, self._categories = prices, categories
+        self._loaded_at = time.monotonic()
+
+    def snapshot(self, refresh=False):
+        # The TTL bounds how long a price change made by another worker goes unseen
+        with self._lock:
+            if refresh or self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load()
+            return self._prices, self._categories
+
+    def price_lines(self, lines):
+        try:
+            unit_prices = self._unit_prices(lines, *self.snapshot())
+        except InvalidOrderLine:
+            # The product may be newer than the index; retry once against fresh prices
+            unit_prices = self._unit_prices(lines, *self.snapshot(refresh=True))
+        return [round(unit * line['quantity'], 2) for unit, line in zip(unit_prices, lines)]
+
+    def _unit_prices(self, lines, prices, categories):
+        size = len(prices)
+        ids = [line['product_id'] for line in lines]
+        for line, product_id in zip(lines, ids):
+            if not 0 <= product_id < size or math.isnan(prices[product_id]) or \
+                    line['category'] not in (None, categories[product_id]):
+                raise InvalidOrderLine(f"Unknown {line['key']} {product_id}")
+        return [prices[product_id] for product_id in ids]
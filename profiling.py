@@ -0,0 +1,181 @@
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from flask import g, has_request_context, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Cumulative Prometheus histogram
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+# SQL timing for whichever request is running on this thread; registered once for every engine
+# and app, and a no-op unless the request is being measured. The start time lives on the statement's
+# execution context, so a statement that raises (and never reaches after_cursor_execute) leaves
+# nothing behind on the pooled connection.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and has_request_context() and 'request_metrics' in g:
+        context.request_metrics_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'request_metrics_started', None)
+    if started is not None and has_request_context() and 'request_metrics' in g:
+        g.request_metrics['sql'] += time.perf_counter() - started
+        g.request_metrics['queries'] += 1
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# Per-request wall, SQL and JSON timings, reported as Server-Timing headers and /metrics histograms,
+# with cProfile dumps for a sample of slow requests
+class RequestMetrics:
+    METRICS = (
+        ('matrix_request_duration_seconds', 'Wall time per request', DURATION_BUCKETS),
+        ('matrix_request_sql_seconds', 'SQL time per request', DURATION_BUCKETS),
+        ('matrix_request_sql_queries', 'SQL statements per request', QUERY_BUCKETS),
+        ('matrix_request_serialization_seconds', 'JSON encoding time per request', DURATION_BUCKETS),
+        ('matrix_response_size_bytes', 'Response body size', SIZE_BUCKETS),
+    )
+
+    def __init__(self, app=None, profile_dir=None, sample_rate=0.0, slow_ms=500, metrics_token=None):
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.metrics_token = metrics_token
+        self._histograms = defaultdict(lambda: {name: Histogram(buckets) for name, _, buckets in self.METRICS})
+        self._responses = defaultdict(int)
+        self._lock = threading.Lock()
+        # cProfile can only run one profiler at a time
+        self._profiler_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        # Time JSON encoding through the app's provider, covering jsonify and the catalog cache alike
+        provider = app.json
+        dumps = provider.dumps
+
+        def timed_dumps(obj, **kwargs):
+            started = time.perf_counter()
+            try:
+                return dumps(obj, **kwargs)
+            finally:
+                if has_request_context() and 'request_metrics' in g:
+                    g.request_metrics['json'] += time.perf_counter() - started
+
+        provider.dumps = timed_dumps
+
+    def _start(self):
+        g.request_metrics = {'started': time.perf_counter(), 'sql': 0.0, 'queries': 0, 'json': 0.0}
+        if self.profile_dir and self.sample_rate and random.random() < self.sample_rate:
+            if self._profiler_lock.acquire(blocking=False):
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Another profiling tool (a debugger, or sys.monitoring user) is active
+                    self._profiler_lock.release()
+                else:
+                    g.request_profiler = profiler
+
+    def _finish(self, response):
+        metrics = g.pop('request_metrics', None)
+        if metrics is None:
+            return response
+        elapsed = time.perf_counter() - metrics['started']
+        profiler = g.pop('request_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._profiler_lock.release()
+            if elapsed * 1000 >= self.slow_ms:
+                self._dump_profile(profiler, elapsed)
+
+        response.headers.add('Server-Timing', ', '.join((
+            f'app;dur={elapsed * 1000:.1f}',
+            f'db;dur={metrics["sql"] * 1000:.1f};desc="{metrics["queries"]} queries"',
+            f'json;dur={metrics["json"] * 1000:.1f}',
+        )))
+        if request.endpoint == 'metrics':
+            return response
+
+        size = response.calculate_content_length()
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        with self._lock:
+            histograms = self._histograms[request.method, route]
+            histograms['matrix_request_duration_seconds'].observe(elapsed)
+            histograms['matrix_request_sql_seconds'].observe(metrics['sql'])
+            histograms['matrix_request_sql_queries'].observe(metrics['queries'])
+            histograms['matrix_request_serialization_seconds'].observe(metrics['json'])
+            if size is not None:
+                histograms['matrix_response_size_bytes'].observe(size)
+            self._responses[request.method, route, response.status_code] += 1
+        return response
+
+    def _teardown(self, exc):
+        # after_request doesn't run if the response couldn't be built; never leave the profiler running
+        profiler = g.pop('request_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._profiler_lock.release()
+
+    def _dump_profile(self, profiler, elapsed):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        route = re.sub(r'[^A-Za-z0-9]+', '_', request.path).strip('_') or 'index'
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}-{request.method}-{route}-{elapsed * 1000:.0f}ms.prof'
+        profiler.dump_stats(os.path.join(self.profile_dir, name))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, description, _ in self.METRICS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (method, route), histograms in sorted(self._histograms.items()):
+                    lines.extend(histograms[name].lines(name, f'method="{method}",route="{_label(route)}"'))
+            lines.append('# HELP matrix_responses_total Responses by status code')
+            lines.append('# TYPE matrix_responses_total counter')
+            for (method, route, status), count in sorted(self._responses.items()):
+                lines.append(f'matrix_responses_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        if self.metrics_token and request.headers.get('Authorization') != f'Bearer {self.metrics_token}':
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
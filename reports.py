@@ -0,0 +1,112 @@
+from flask import current_app, Response, make_response, request, jsonify, abort, stream_with_context
+from flask_restful import Resource
+from datetime import date
+import csv
+import io
+from sqlalchemy import select
+from auth import admin_required
+from catalog import MAX_PAGE_SIZE
+from models import db, User, Order, OrderProduct, OrderDailyRollup
+
+# Reports Resources: admin dashboards read the daily rollup, never the raw orders
+def report_filters():
+    args = request.args
+    filters = []
+    try:
+        if args.get('from'):
+            filters.append(OrderDailyRollup.day >= date.fromisoformat(args['from']))
+        if args.get('to'):
+            filters.append(OrderDailyRollup.day <= date.fromisoformat(args['to']))
+    except ValueError:
+        abort(make_response(jsonify({"error": "Dates must be YYYY-MM-DD"}), 400))
+    if args.get('category'):
+        filters.append(OrderDailyRollup.category == args['category'])
+    return filters
+
+class RevenueReport(Resource):
+    @admin_required
+    def get(self):
+        rows = db.session.execute(
+            select(
+                OrderDailyRollup.day,
+                db.func.sum(OrderDailyRollup.revenue).label('revenue'),
+                db.func.sum(OrderDailyRollup.quantity).label('quantity'),
+                db.func.sum(OrderDailyRollup.line_count).label('lines'),
+            )
+            .where(*report_filters())
+            .group_by(OrderDailyRollup.day)
+            .order_by(OrderDailyRollup.day)
+        ).all()
+        response = [
+            {"day": row.day.isoformat(), "revenue": round(row.revenue, 2), "quantity": row.quantity, "lines": row.lines}
+            for row in rows
+        ]
+        return make_response(jsonify(response), 200)
+
+class TopProductsReport(Resource):
+    @admin_required
+    def get(self):
+        limit = max(1, min(request.args.get('limit', 10, type=int), MAX_PAGE_SIZE))
+        revenue = db.func.sum(OrderDailyRollup.revenue).label('revenue')
+        rows = db.session.execute(
+            select(
+                OrderDailyRollup.product_id,
+                OrderDailyRollup.category,
+                revenue,
+                db.func.sum(OrderDailyRollup.quantity).label('quantity'),
+            )
+            .where(*report_filters())
+            .group_by(OrderDailyRollup.product_id, OrderDailyRollup.category)
+            .order_by(revenue.desc(), OrderDailyRollup.product_id)
+            .limit(limit)
+        ).all()
+        response = [
+            {"product_id": row.product_id, "category": row.category, "revenue": round(row.revenue, 2),
+             "quantity": row.quantity}
+            for row in rows
+        ]
+        return make_response(jsonify(response), 200)
+
+# Export Resource: streams whole tables to admins in constant memory
+EXPORT_BATCH_SIZE = 1000
+EXPORTS = {
+    'users': (User, User.user_id),
+    'orders': (Order, Order.id),
+    'order-lines': (OrderProduct, OrderProduct.id),
+}
+
+def export_rows(projection, order_by, format):
+    # yield_per streams rows in batches (a server-side cursor where the driver has one)
+    statement = projection.statement.order_by(order_by).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    result = db.session.execute(statement)
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(projection.fields)
+        for rows in result.partitions():
+            writer.writerows(record.values() for record in projection.to_dicts(rows))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for rows in result.partitions():
+            yield "".join(current_app.json.dumps(record, separators=(',', ':')) + "\n" for record in projection.to_dicts(rows))
+
+class Export(Resource):
+    @admin_required
+    def get(self, name):
+        if name not in EXPORTS:
+            abort(404)
+        model, order_by = EXPORTS[name]
+        format = request.args.get('format', 'ndjson')
+        if format not in ('ndjson', 'csv'):
+            return make_response(jsonify({"error": "format must be ndjson or csv"}), 400)
+        mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(export_rows(model.projection, order_by, format)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{name}.{format}"'
+        return response
+
+def register(app, api):
+    api.add_resource(RevenueReport, '/reports/revenue')
+    api.add_resource(TopProductsReport, '/reports/top-products')
+    api.add_resource(Export, '/export/<string:name>')
@@ -1,78 +1,143 @@
-from app import app
-from models import db, User, BeamBlock, HollowBlock, PavingBlock, RoadKerb, Service, Gallery, Order, OrderProduct
-from datetime import date
-
-def delete_data():
-    with app.app_context():
-        print("Deleting data...")
-        OrderProduct.query.delete()
-        Order.query.delete()
-        Gallery.query.delete()
-        Service.query.delete()
-        RoadKerb.query.delete()
-        PavingBlock.query.delete()
-        HollowBlock.query.delete()
-        BeamBlock.query.delete()
-        User.query.delete()
-
-def seed_data():
-    with app.app_context():
-        try:
-            print("Creating users...")
-            user1 = User(user_name="John Doe", email="john@example.com", password="password", role="customer", phone_number="1234567890")
-            user2 = User(user_name="Jane Smith", email="jane@example.com", password="password", role="customer", phone_number="0987654321")
-            admin = User(user_name="Admin User", email="admin@example.com", password="password", role="admin", phone_number="1122334455")
-            users = [user1, user2, admin]
-
-            print("Creating beamblocks...")
-            beamblock1 = BeamBlock(price=10.50, image_url='static/BeamBlock.jpeg', description='High-quality beam block')
-            beamblock2 = BeamBlock(price=15.75, image_url='/static/BeamBlock.jpeg', description='Durable beam block')
-            beamblocks = [beamblock1, beamblock2]
-
-            print("Creating hollowblocks...")
-            hollowblock1 = HollowBlock(price=8.25, image_url='https://example.com/image3.jpg', description='Strong hollow block')
-            hollowblock2 = HollowBlock(price=12.00, image_url='https://example.com/image4.jpg', description='Reliable hollow block')
-            hollowblocks = [hollowblock1, hollowblock2]
-
-            print("Creating pavingblocks...")
-            pavingblock1 = PavingBlock(price=5.75, image_url='https://example.com/image5.jpg', description='Smooth paving block')
-            pavingblock2 = PavingBlock(price=7.50, image_url='https://example.com/image6.jpg', description='Textured paving block')
-            pavingblocks = [pavingblock1, pavingblock2]
-
-            print("Creating roadkerbs...")
-            roadkerb1 = RoadKerb(price=20.00, image_url='https://example.com/image7.jpg', description='Durable road kerb')
-            roadkerb2 = RoadKerb(price=25.00, image_url='https://example.com/image8.jpg', description='Premium road kerb')
-            roadkerbs = [roadkerb1, roadkerb2]
-
-            print("Creating services...")
-            service1 = Service(price=100.00, image_url='https://example.com/image9.jpg', description='Construction service')
-            service2 = Service(price=150.00, image_url='https://example.com/image10.jpg', description='Landscaping service')
-            services = [service1, service2]
-
-            print("Creating gallery items...")
-            gallery1 = Gallery(image_url='https://example.com/gallery1.jpg')
-            gallery2 = Gallery(image_url='https://example.com/gallery2.jpg')
-            galleries = [gallery1, gallery2]
-
-            print("Creating orders...")
-            order1 = Order(user=user1, total_price=250.00)
-            order2 = Order(user=user2, total_price=350.00)
-            orders = [order1, order2]
-
-            print("Creating order products...")
-            order_product1 = OrderProduct(order=order1, beamblock=beamblock1, hollowblock=hollowblock1)
-            order_product2 = OrderProduct(order=order2, pavingblock=pavingblock1, roadkerb=roadkerb1, service=service1)
-            order_products = [order_product1, order_product2]
-
-            print("Committing to database...")
-            db.session.add_all(users + beamblocks + hollowblocks + pavingblocks + roadkerbs + services + galleries + orders + order_products)
-            db.session.commit()
-
-            print("Seeding completed successfully!")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Error seeding data: {e}")
+from models import db, User, Product, BeamBlock, HollowBlock, PavingBlock, RoadKerb, Service, Gallery, Order, OrderProduct
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, select, text
+import random
+
+# Synthetic data: deterministic for a given seed, inserted in executemany chunks
+CATEGORIES = ('beamblock', 'hollowblock', 'pavingblock', 'roadkerb', 'service')
+ADJECTIVES = ('durable', 'reinforced', 'lightweight', 'premium', 'standard', 'textured', 'smooth', 'interlocking')
+NOUNS = ('beam block', 'hollow block', 'paving block', 'road kerb', 'landscaping service', 'installation service')
+
+def synthetic_products(count, rng):
+    return [
+        {'category': rng.choice(CATEGORIES), 'price': round(rng.uniform(5, 250), 2), 'image_url': None,
+         'description': f'{rng.choice(ADJECTIVES).capitalize()} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} #{i}'}
+        for i in range(1, count + 1)
+    ]
+
+def synthetic_users(start, count, password_hashes):
+    # The first synthetic user is an admin, so reports and exports can be exercised too
+    return [
+        {'user_id': i, 'user_name': f'user{i}', 'email': f'user{i}@example.com',
+         'password': password_hashes[i % len(password_hashes)],
+         'role': 'admin' if i == 1 else 'customer', 'phone_number': f'07{i % 10 ** 8:08d}'}
+        for i in range(start, start + count)
+    ]
+
+# bcrypt is deliberately slow, so each distinct password is hashed once and the hash shared
+def hash_passwords(passwords, hasher):
+    hashes = {}
+    for password in passwords:
+        if password not in hashes:
+            hashes[password] = hasher.generate_password_hash(password)
+    return [hashes[password] for password in passwords]
+
+# progress(table, rows) is called after every chunk is inserted
+def seed_synthetic(connection, users, orders, password_hashes, products=500, lines_per_order=4, seed=1,
+                   chunk_size=10_000, progress=None):
+    rng = random.Random(seed)
+    progress = progress or (lambda table, rows: None)
+    counts = {'users': users, 'products': products, 'orders': orders, 'order_products': 0}
+
+    connection.execute(insert(Product.__table__), synthetic_products(products, rng))
+    progress('products', products)
+    product_rows = connection.execute(select(Product.id, Product.price)).all()
+
+    first_user = (connection.scalar(select(func.max(User.user_id))) or 0) + 1
+    for offset in range(0, users, chunk_size):
+        count = min(chunk_size, users - offset)
+        connection.execute(insert(User.__table__), synthetic_users(first_user + offset, count, password_hashes))
+        progress('users', count)
+
+    # Orders spread over the last year; ids are assigned here so lines can reference them without RETURNING
+    first_order = (connection.scalar(select(func.max(Order.id))) or 0) + 1
+    start = datetime.now().replace(microsecond=0) - timedelta(days=365)
+    for offset in range(0, orders, chunk_size):
+        order_rows = []
+        line_rows = []
+        for order_id in range(first_order + offset, first_order + min(offset + chunk_size, orders)):
+            total = 0
+            for _ in range(rng.randint(1, 2 * lines_per_order - 1)):
+                product_id, price = rng.choice(product_rows)
+                quantity = rng.randint(1, 20)
+                subtotal = round(price * quantity, 2)
+                total += subtotal
+                line_rows.append({'order_id': order_id, 'product_id': product_id, 'quantity': quantity, 'subtotal': subtotal})
+            order_rows.append({'id': order_id, 'user_id': rng.randint(first_user, first_user + users - 1),
+                               'order_date': start + timedelta(seconds=rng.randrange(365 * 86400)),
+                               'total_price': round(total, 2)})
+        connection.execute(insert(Order.__table__), order_rows)
+        progress('orders', len(order_rows))
+        connection.execute(insert(OrderProduct.__table__), line_rows)
+        progress('order_products', len(line_rows))
+        counts['order_products'] += len(line_rows)
+    sync_sequences(connection, (User.user_id, Order.id))
+    return counts
+
+# Inserting explicit ids doesn't advance PostgreSQL's serial sequences, so the next id the app
+# generates would collide; move each sequence past the highest id in its table
+def sync_sequences(connection, columns):
+    if connection.dialect.name != 'postgresql':
+        return
+    for column in columns:
+        connection.execute(select(func.setval(
+            func.pg_get_serial_sequence(column.table.name, column.name),
+            func.coalesce(select(func.max(column)).scalar_subquery(), 0) + 1,
+            False,
+        )))
+
+def truncate_data(connection):
+    tables = list(reversed(db.metadata.sorted_tables))
+    if connection.dialect.name == 'postgresql':
+        names = ', '.join(connection.dialect.identifier_preparer.format_table(table) for table in tables)
+        connection.execute(text(f'TRUNCATE TABLE {names} RESTART IDENTITY CASCADE'))
+    else:
+        # Children first, so foreign keys are never violated part way through
+        for table in tables:
+            connection.execute(table.delete())
+
+# Small fixed data set for local development: three users (password "password") and a few of everything
+def seed_demo(session, password_hash):
+    user1 = User(user_name="John Doe", email="john@example.com", password=password_hash, role="customer", phone_number="1234567890")
+    user2 = User(user_name="Jane Smith", email="jane@example.com", password=password_hash, role="customer", phone_number="0987654321")
+    admin = User(user_name="Admin User", email="admin@example.com", password=password_hash, role="admin", phone_number="1122334455")
+    users = [user1, user2, admin]
+
+    beamblock1 = BeamBlock(price=10.50, image_url='static/BeamBlock.jpeg', description='High-quality beam block')
+    beamblock2 = BeamBlock(price=15.75, image_url='/static/BeamBlock.jpeg', description='Durable beam block')
+    hollowblock1 = HollowBlock(price=8.25, image_url='https://example.com/image3.jpg', description='Strong hollow block')
+    hollowblock2 = HollowBlock(price=12.00, image_url='https://example.com/image4.jpg', description='Reliable hollow block')
+    pavingblock1 = PavingBlock(price=5.75, image_url='https://example.com/image5.jpg', description='Smooth paving block')
+    pavingblock2 = PavingBlock(price=7.50, image_url='https://example.com/image6.jpg', description='Textured paving block')
+    roadkerb1 = RoadKerb(price=20.00, image_url='https://example.com/image7.jpg', description='Durable road kerb')
+    roadkerb2 = RoadKerb(price=25.00, image_url='https://example.com/image8.jpg', description='Premium road kerb')
+    service1 = Service(price=100.00, image_url='https://example.com/image9.jpg', description='Construction service')
+    service2 = Service(price=150.00, image_url='https://example.com/image10.jpg', description='Landscaping service')
+    products = [beamblock1, beamblock2, hollowblock1, hollowblock2, pavingblock1, pavingblock2, roadkerb1, roadkerb2, service1, service2]
+
+    galleries = [Gallery(image_url='https://example.com/gallery1.jpg'), Gallery(image_url='https://example.com/gallery2.jpg')]
+
+    order1 = Order(user=user1, order_products=[
+        OrderProduct(product=beamblock1, subtotal=beamblock1.price),
+        OrderProduct(product=hollowblock1, subtotal=hollowblock1.price),
+    ])
+    order2 = Order(user=user2, order_products=[
+        OrderProduct(product=pavingblock1, subtotal=pavingblock1.price),
+        OrderProduct(product=roadkerb1, subtotal=roadkerb1.price),
+        OrderProduct(product=service1, subtotal=service1.price),
+    ])
+    orders = [order1, order2]
+    for order in orders:
+        order.total_price = round(sum(line.subtotal for line in order.order_products), 2)
+
+    session.add_all(users + products + galleries + orders)
+    session.flush()
+    return {'users': len(users), 'products': len(products), 'gallery': len(galleries), 'orders': len(orders),
+            'order_products': sum(len(order.order_products) for order in orders)}
 
 if __name__ == '__main__':
-    delete_data()  # Uncomment this line if you want to delete all data before seeding
-    seed_data()
+    # Same as `flask seed`, e.g. python seed.py --users 10000 --orders 250000
+    from app import create_app
+    from commands import seed_command
+    with create_app().app_context():
+        seed_command.main(prog_name='seed.py')
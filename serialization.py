@@ -0,0 +1,24 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Keyword arguments DefaultJSONProvider.response() passes that orjson can honour
+ORJSON_KWARGS = {'indent', 'separators'}
+
+# Flask's JSON provider with orjson as the encoder when it's installed. Output matches the
+# stdlib provider (sorted keys, Flask's date format) except that non-ASCII text isn't escaped.
+class JSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        if orjson is None or not kwargs.keys() <= ORJSON_KWARGS or kwargs.get('indent') not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode()
+        except TypeError:
+            # orjson rejects some values the stdlib accepts, e.g. integers beyond 64 bits
+            return super().dumps(obj, **kwargs)
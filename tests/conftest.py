@@ -0,0 +1,111 @@
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, func, select
+from app import create_app
+from models import db, Order, rebuild_daily_rollup
+from seed import seed_synthetic
+
+# Records the SQL statements run on an engine, for asserting query budgets
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def assert_at_most(self, limit):
+        if self.count > limit:
+            raise AssertionError(
+                f"Expected at most {limit} queries, got {self.count}:\n" + "\n".join(self.statements)
+            )
+
+def make_app(database_uri):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri, 'TESTING': True, 'BCRYPT_LOG_ROUNDS': 4})
+    with app.app_context():
+        db.create_all()
+    return app
+
+def close_app(app):
+    with app.app_context():
+        db.engine.dispose()
+    app.extensions['password_hasher'].shutdown()
+
+# Synthetic users, products and orders; user 1 is an admin
+def seed(app, users, orders, products):
+    with app.app_context():
+        with db.engine.begin() as connection:
+            seed_synthetic(connection, users=users, orders=orders, password_hashes=['not-a-real-hash'], products=products)
+            rebuild_daily_rollup(connection)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+
+# The customer with the most orders, so order history cases are the worst case
+def busiest_customer_id(app):
+    with app.app_context():
+        return db.session.execute(
+            select(Order.user_id).where(Order.user_id != 1)
+            .group_by(Order.user_id).order_by(func.count().desc()).limit(1)
+        ).scalar()
+
+def bearer(app, user_id, role='customer'):
+    with app.app_context():
+        token = create_access_token(identity=user_id, additional_claims={'role': role})
+    return {'Authorization': f'Bearer {token}'}
+
+# A fresh app on an in-memory database for each test
+@pytest.fixture
+def app():
+    app = make_app('sqlite://')
+    yield app
+    close_app(app)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def seeded(app):
+    seed(app, users=20, orders=400, products=50)
+    return app
+
+@pytest.fixture
+def busiest_customer(seeded):
+    return busiest_customer_id(seeded)
+
+@pytest.fixture
+def auth_headers(app):
+    return lambda user_id, role='customer': bearer(app, user_id, role)
+
+@pytest.fixture
+def query_counter(app):
+    with app.app_context():
+        engine = db.engine
+    return lambda: QueryCounter(engine)
+
+# One app per session for benchmarks, on a file database at a realistic scale; BENCH_USERS,
+# BENCH_ORDERS and BENCH_PRODUCTS change it
+@pytest.fixture(scope='session')
+def benchmark_app(tmp_path_factory):
+    app = make_app(f"sqlite:///{tmp_path_factory.mktemp('benchmark') / 'bench.db'}")
+    seed(
+        app,
+        users=int(os.environ.get('BENCH_USERS', 1_000)),
+        orders=int(os.environ.get('BENCH_ORDERS', 20_000)),
+        products=int(os.environ.get('BENCH_PRODUCTS', 500)),
+    )
+    yield app
+    close_app(app)
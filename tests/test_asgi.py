@@ -0,0 +1,134 @@
+import importlib
+import os
+from datetime import timedelta
+import pytest
+from werkzeug.http import http_date, parse_date
+from models import db, Job, Product
+from tests.conftest import bearer, busiest_customer_id, seed
+
+starlette_testclient = pytest.importorskip('starlette.testclient')
+
+# asgi builds its app from the environment on import, so point it at a throwaway database first
+@pytest.fixture(scope='module')
+def asgi(tmp_path_factory):
+    environment = {
+        'DATABASE_URL': f"sqlite:///{tmp_path_factory.mktemp('asgi') / 'asgi.db'}",
+        'JOB_WORKERS': '0',
+        'BCRYPT_LOG_ROUNDS': '4',
+    }
+    saved = {name: os.environ.get(name) for name in environment}
+    os.environ.update(environment)
+    try:
+        module = importlib.import_module('asgi')
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    with module.flask_app.app_context():
+        db.create_all()
+    seed(module.flask_app, users=20, orders=400, products=50)
+    yield module
+    module.password_hasher.shutdown()
+
+@pytest.fixture
+def async_client(asgi):
+    return starlette_testclient.TestClient(asgi.app)
+
+@pytest.fixture
+def flask_client(asgi):
+    return asgi.flask_app.test_client()
+
+@pytest.mark.parametrize('path', ['/products?limit=20', '/beamblocks?limit=5'])
+def test_catalog_conditional_requests_match_flask(asgi, async_client, flask_client, path):
+    first = async_client.get(path)
+    assert first.status_code == 200
+    etag, last_modified = first.headers['etag'], first.headers['last-modified']
+    earlier = http_date(parse_date(last_modified) - timedelta(days=1))
+    cases = [
+        ({'If-None-Match': etag}, 304),
+        ({'If-None-Match': '"other"'}, 200),
+        ({'If-Modified-Since': last_modified}, 304),
+        ({'If-Modified-Since': earlier}, 200),
+        # An entity tag, when sent, decides on its own
+        ({'If-None-Match': '"other"', 'If-Modified-Since': last_modified}, 200),
+        ({'If-None-Match': etag, 'If-Modified-Since': earlier}, 304),
+    ]
+    for headers, status in cases:
+        assert async_client.get(path, headers=headers).status_code == status, headers
+        assert flask_client.get(path, headers=headers).status_code == status, headers
+
+@pytest.fixture(scope='module')
+def customer(asgi):
+    return bearer(asgi.flask_app, busiest_customer_id(asgi.flask_app))
+
+@pytest.fixture(scope='module')
+def order_body(asgi):
+    with asgi.flask_app.app_context():
+        product_id = db.session.scalar(db.select(Product.id).limit(1))
+    return {'order_products': [{'product_id': product_id, 'quantity': 2}]}
+
+def test_signup_and_login(async_client, flask_client):
+    user = {'user_name': 'asgi', 'email': 'asgi@example.com', 'password': 'secret', 'phone_number': '0712345678'}
+    response = async_client.post('/users', json=user)
+    assert response.status_code == 201
+    flask_user = {**user, 'user_name': 'flask', 'email': 'flask@example.com'}
+    flask_response = flask_client.post('/users', json=flask_user)
+    assert set(response.json()['user']) == set(flask_response.get_json()['user'])
+    assert async_client.post('/users', json=user).status_code == 422
+
+    assert async_client.post('/login', json={'email': user['email'], 'password': 'wrong'}).status_code == 401
+    response = async_client.post('/login', json={'email': user['email'], 'password': 'secret'})
+    assert response.status_code == 200
+    assert response.json()['role'] == 'customer'
+    # Tokens from either server work on the other
+    headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+    assert flask_client.get('/orders', headers=headers).status_code == 200
+
+def test_reads_match_flask(async_client, flask_client, customer):
+    for path, headers in (('/users', None), ('/orders', customer), ('/services?limit=5', None)):
+        response = async_client.get(path, headers=headers)
+        assert response.status_code == 200, path
+        assert response.json() == flask_client.get(path, headers=headers).get_json(), path
+    assert async_client.get('/orders').status_code == 401
+
+def test_expand_falls_back_to_flask(async_client, flask_client):
+    for path in ('/users?expand=orders', '/beamblocks?limit=3&expand=order_lines'):
+        response = async_client.get(path)
+        assert response.status_code == 200, path
+        assert response.json() == flask_client.get(path).get_json(), path
+    assert 'orders' in async_client.get('/users?expand=orders').json()[0]
+
+def test_create_order(asgi, async_client, customer, order_body):
+    response = async_client.post('/orders', json=order_body, headers=customer)
+    assert response.status_code == 201
+    order = response.json()
+    with asgi.flask_app.app_context():
+        price = db.session.get(Product, order_body['order_products'][0]['product_id']).price
+        job = db.session.scalars(db.select(Job).order_by(Job.id.desc()).limit(1)).first()
+    assert order['total_price'] == round(price * 2, 2)
+    assert job.payload == {'order_id': order['id']}
+
+    assert async_client.post('/orders', json={'order_products': []}, headers=customer).status_code == 422
+    assert async_client.post('/orders', json={'order_products': [{'product_id': 10 ** 6}]}, headers=customer).status_code == 422
+    for body in ('[]', '"x"', 'not json'):
+        response = async_client.post('/orders', content=body, headers={**customer, 'Content-Type': 'application/json'})
+        assert response.status_code == 400
+        assert response.json() == {'error': 'Malformed order data'}
+
+def test_idempotency_key_falls_back_to_flask(asgi, async_client, flask_client, customer, order_body):
+    headers = {**customer, 'Idempotency-Key': 'asgi-checkout'}
+    first = async_client.post('/orders', json=order_body, headers=headers)
+    assert first.status_code == 201
+    # Stored by the Flask handler, so either server replays it
+    for client in (async_client, flask_client):
+        retry = client.post('/orders', json=order_body, headers=headers)
+        assert retry.status_code == 201
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert async_client.post('/orders', json={'order_products': []}, headers=headers).status_code == 422
+
+def test_admin_routes_through_asgi(async_client, customer, asgi):
+    assert async_client.get('/export/users', headers=customer).status_code == 403
+    assert async_client.get('/reports/revenue', headers=customer).status_code == 403
+    assert async_client.get('/reports/revenue', headers=bearer(asgi.flask_app, 1, 'admin')).status_code == 200
@@ -0,0 +1,65 @@
+# Microbenchmarks for serialization and queries through Flask's test client, on benchmark_app.
+#   python -m pytest tests/test_benchmarks.py [--benchmark-only] [-k orders]
+#   BENCH_USERS=10000 BENCH_ORDERS=250000 python -m pytest tests/test_benchmarks.py
+import pytest
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Product, Order, order_loader_options
+from tests.conftest import bearer, busiest_customer_id
+
+pytest.importorskip('pytest_benchmark')
+
+@pytest.fixture(scope='module')
+def bench(benchmark_app):
+    app = benchmark_app
+    user_id = busiest_customer_id(app)
+    with app.app_context():
+        product_rows = db.session.execute(Product.projection.statement.limit(200)).all()
+        orders = Order.query.options(*order_loader_options(selectinload, joinedload)).filter_by(user_id=user_id).all()
+    return {
+        'app': app,
+        'client': app.test_client(),
+        'customer': bearer(app, user_id),
+        'admin': bearer(app, 1, 'admin'),
+        'product_rows': product_rows,
+        'records': Product.projection.to_dicts(product_rows),
+        'orders': orders,
+        'order_id': orders[-1].id,
+    }
+
+def test_projection_to_dicts(benchmark, bench):
+    benchmark(Product.projection.to_dicts, bench['product_rows'])
+
+def test_json_dumps(benchmark, bench):
+    with bench['app'].app_context():
+        benchmark(bench['app'].json.dumps, bench['records'])
+
+def test_order_to_dict(benchmark, bench):
+    benchmark(lambda: [order.to_dict() for order in bench['orders']])
+
+# (url, headers, whether the catalog cache is cleared before each call)
+GETS = {
+    'products_cold': ('/products?limit=200', None, True),
+    'products_warm': ('/products?limit=200', None, False),
+    'beamblocks_expand_cold': ('/beamblocks?limit=20&expand=order_lines', None, True),
+    'search_cold': ('/search?q=reinforced', None, True),
+    'orders_busiest_customer': ('/orders', 'customer', False),
+    'order_by_id': ('/orders/{order_id}', 'customer', False),
+    'reports_revenue': ('/reports/revenue', 'admin', False),
+    'reports_top_products': ('/reports/top-products', 'admin', False),
+}
+
+@pytest.mark.parametrize('case', GETS)
+def test_get(benchmark, bench, case):
+    url, auth, cold = GETS[case]
+    url = url.format(order_id=bench['order_id'])
+    headers = bench[auth] if auth else None
+    client = bench['client']
+    catalog_cache = bench['app'].extensions['catalog_cache']
+
+    def call():
+        if cold:
+            catalog_cache.clear()
+        return client.get(url, headers=headers)
+
+    response = benchmark(call)
+    assert response.status_code == 200, (url, response.status_code)
@@ -0,0 +1,143 @@
+import time
+import cache
+from cache import TTLCache
+from models import db, BeamBlock, Gallery, Job, OrderProduct, Product
+
+def test_delete_ordered_product_conflicts(seeded, client, auth_headers):
+    with seeded.app_context():
+        product_id = db.session.scalar(
+            db.select(OrderProduct.product_id).join(OrderProduct.product).where(BeamBlock.category == 'beamblock').limit(1)
+        )
+    response = client.delete('/beamblocks', json={'beamblock_id': product_id}, headers=auth_headers(1, 'admin'))
+    assert response.status_code == 409
+    with seeded.app_context():
+        assert db.session.get(BeamBlock, product_id) is not None
+
+def test_delete_unordered_product(seeded, client, auth_headers):
+    with seeded.app_context():
+        db.session.add(BeamBlock(price=10.5, description='Unsold beam block'))
+        db.session.commit()
+        product_id = db.session.scalar(db.select(db.func.max(BeamBlock.id)))
+    response = client.delete('/beamblocks', json={'beamblock_id': product_id}, headers=auth_headers(1, 'admin'))
+    assert response.status_code == 200
+    with seeded.app_context():
+        assert db.session.get(BeamBlock, product_id) is None
+
+def catalog_ids(client, path='/beamblocks?limit=200'):
+    return [product['id'] for product in client.get(path).get_json()]
+
+def test_second_get_is_served_from_cache(seeded, client, query_counter):
+    first = client.get('/products?limit=20')
+    with query_counter() as counter:
+        second = client.get('/products?limit=20')
+    assert second.get_data() == first.get_data()
+    counter.assert_at_most(0)
+
+def test_cached_entries_expire(seeded, client, query_counter, monkeypatch):
+    client.get('/products?limit=20')
+    later = time.monotonic() + seeded.extensions['catalog_cache'].ttl + 1
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: later)
+    with query_counter() as counter:
+        client.get('/products?limit=20')
+    assert counter.count > 0
+
+def test_product_writes_change_the_next_response(seeded, client, auth_headers):
+    admin = auth_headers(1, 'admin')
+    before = catalog_ids(client)
+    response = client.post('/beamblocks', json={'price': 12.5, 'description': 'Fresh beam block'}, headers=admin)
+    assert response.status_code == 201
+    product_id = response.get_json()['id']
+    assert catalog_ids(client) == before + [product_id]
+
+    # The same commit hook covers updates
+    with seeded.app_context():
+        db.session.get(BeamBlock, product_id).price = 99.0
+        db.session.commit()
+    assert [p['price'] for p in client.get('/beamblocks?limit=200').get_json() if p['id'] == product_id] == [99.0]
+
+    response = client.delete('/beamblocks', json={'beamblock_id': product_id}, headers=admin)
+    assert response.status_code == 200
+    assert catalog_ids(client) == before
+
+def test_rolled_back_write_does_not_invalidate(seeded, client, query_counter):
+    client.get('/products?limit=20')
+    with seeded.app_context():
+        db.session.add(BeamBlock(price=1.0, description='Never committed'))
+        db.session.flush()
+        db.session.rollback()
+        # A later commit of other tables must not pick up the discarded write either
+        db.session.add(Job(task='send_order_confirmation', payload={}, status='done', attempts=1, max_attempts=1))
+        db.session.commit()
+    with query_counter() as counter:
+        client.get('/products?limit=20')
+    counter.assert_at_most(0)
+
+def test_unrelated_commit_during_build_keeps_page(seeded):
+    catalog_cache = seeded.extensions['catalog_cache']
+    with seeded.app_context():
+        generation = catalog_cache.generation
+        # A checkout's side effects commit while the page is being built
+        db.session.add(Job(task='send_order_confirmation', payload={}, status='done', attempts=1, max_attempts=1))
+        db.session.commit()
+        catalog_cache.set('page', b'body', {'products'}, generation)
+    assert catalog_cache.get('page') == b'body'
+
+def test_related_commit_during_build_drops_page(seeded):
+    catalog_cache = seeded.extensions['catalog_cache']
+    with seeded.app_context():
+        generation = catalog_cache.generation
+        db.session.add(BeamBlock(price=1.0, description='Added mid-build'))
+        db.session.commit()
+        catalog_cache.set('page', b'body', {'products'}, generation)
+    assert catalog_cache.get('page') is None
+
+def test_discarded_key_during_build_is_dropped():
+    identities = TTLCache(maxsize=2)
+    generation = identities.generation
+    identities.discard([1])
+    identities.set(1, 'stale', (), generation)
+    identities.set(2, 'fresh', (), generation)
+    assert identities.get(1) is None
+    assert identities.get(2) == 'fresh'
+    # Once the change record is forgotten, older builds are dropped rather than trusted
+    identities.discard([3, 4, 5])
+    identities.set(2, 'unknown', (), generation)
+    assert identities.get(2) == 'fresh'
+
+def test_catalog_returns_every_section(seeded, client):
+    with seeded.app_context():
+        db.session.add_all([Gallery(image_url=f'/images/{i}.jpg') for i in range(3)])
+        db.session.commit()
+    response = client.get('/catalog?limit=2')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body['sections']) == {'beamblocks', 'hollowblocks', 'pavingblocks', 'roadkerbs', 'services', 'gallery'}
+    for name, records in body['sections'].items():
+        assert len(records) == 2
+        # Each section's cursor continues it through its own endpoint
+        rest = client.get(f"/{name}?limit=2&after={body['cursors'][name]}").get_json()
+        assert rest[0]['id'] > records[-1]['id']
+    assert all(product['category'] == 'beamblock' for product in body['sections']['beamblocks'])
+    assert set(body['sections']['beamblocks'][0]) == set(Product.projection.fields)
+
+def test_catalog_sections_and_fields(seeded, client):
+    response = client.get('/catalog?sections=services,roadkerbs&fields=price&services_limit=1')
+    assert response.status_code == 200
+    sections = response.get_json()['sections']
+    assert set(sections) == {'services', 'roadkerbs'}
+    assert len(sections['services']) == 1
+    assert all(set(record) == {'id', 'price'} for records in sections.values() for record in records)
+
+def test_catalog_rejects_unknown_sections_and_fields(seeded, client):
+    assert client.get('/catalog?sections=beamblocks,widgets').status_code == 400
+    assert client.get('/catalog?fields=price,password').status_code == 400
+
+def test_catalog_follows_product_writes(seeded, client, auth_headers):
+    before = client.get('/catalog?sections=services&limit=200').get_json()['sections']['services']
+    response = client.post('/services', json={'price': 75, 'description': 'Site survey'}, headers=auth_headers(1, 'admin'))
+    after = client.get('/catalog?sections=services&limit=200').get_json()['sections']['services']
+    assert [record['id'] for record in after] == [record['id'] for record in before] + [response.get_json()['id']]
+
+def test_cache_stats_are_admin_only(seeded, client, auth_headers):
+    assert client.get('/cache/stats', headers=auth_headers(2)).status_code == 403
+    assert set(client.get('/cache/stats', headers=auth_headers(1, 'admin')).get_json()) >= {'hits', 'misses', 'size'}
@@ -0,0 +1,23 @@
+import os
+import time
+import pytest
+from hashing import HasherBusy, PasswordHasher
+
+def exit_worker():
+    os._exit(1)
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, workers=1, timeout=10)
+    yield hasher
+    hasher.shutdown()
+
+def test_broken_pool_is_busy_and_replaced(hasher):
+    with pytest.raises(HasherBusy):
+        hasher._run(exit_worker)
+    assert hasher.check_password_hash(hasher.generate_password_hash('password'), 'password')
+
+def test_timeout_is_busy(hasher):
+    hasher.timeout = 0.01
+    with pytest.raises(HasherBusy):
+        hasher._run(time.sleep, 1)
@@ -0,0 +1,33 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from PIL import Image
+from images import InvalidImage, ingest_image
+
+def png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def test_decompression_bomb_is_invalid(tmp_path, monkeypatch):
+    # Pillow refuses images over twice MAX_IMAGE_PIXELS
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    with pytest.raises(InvalidImage):
+        ingest_image(png(100, 100), str(tmp_path))
+    assert not list(tmp_path.iterdir())
+
+def test_not_an_image_is_invalid(tmp_path):
+    with pytest.raises(InvalidImage):
+        ingest_image(b'not an image', str(tmp_path))
+
+def test_concurrent_ingests_of_one_image(tmp_path):
+    data = png(700, 400)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: ingest_image(data, str(tmp_path)), range(8)))
+    assert all(result == results[0] for result in results)
+    names = sorted(path.name for path in tmp_path.iterdir())
+    # The original plus two formats at 320 and 640 wide (1280 collapses to the original 700)
+    assert len(names) == 7
+    assert not [name for name in names if name.endswith('.tmp')]
+    for path in tmp_path.iterdir():
+        Image.open(path).verify()
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+import pytest
+import jobs
+from jobs import enqueue, purge_finished
+from models import db, Job
+
+@pytest.fixture
+def queue(app):
+    return app.extensions['job_queue']
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    def succeed(**payload):
+        calls.append(payload)
+
+    def fail(**payload):
+        calls.append(payload)
+        raise RuntimeError("gateway down")
+
+    monkeypatch.setitem(jobs.TASKS, 'succeed', succeed)
+    monkeypatch.setitem(jobs.TASKS, 'fail', fail)
+    return calls
+
+def add_job(app, task_name, **kwargs):
+    with app.app_context():
+        job = enqueue(db.session, task_name, **kwargs)
+        db.session.commit()
+        return job.id
+
+def stored(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+def make_due(app, job_id):
+    with app.app_context():
+        db.session.execute(db.update(Job).filter_by(id=job_id).values(run_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+
+def test_test_apps_start_no_workers(app, queue):
+    assert app.config['JOB_WORKERS'] == 0
+    assert queue.workers == 0
+
+def test_successful_job_is_done(app, queue, calls):
+    job_id = add_job(app, 'succeed', order_id=7)
+    assert queue.run_once()
+    assert calls == [{'order_id': 7}]
+    job = stored(app, job_id)
+    assert (job.status, job.attempts, job.locked_until, job.last_error) == ('done', 1, None, None)
+    assert job.finished_at is not None
+    assert not queue.run_once()
+
+def test_failing_job_backs_off_until_max_attempts(app, queue, calls):
+    job_id = add_job(app, 'fail', max_attempts=3)
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        assert queue.run_once()
+        job = stored(app, job_id)
+        assert (job.status, job.attempts) == ('queued', attempt)
+        assert 'gateway down' in job.last_error
+        # Exponential backoff with jitter between half and all of base * 2 ** (attempt - 1)
+        delay = queue.backoff_base * 2 ** (attempt - 1)
+        assert before + timedelta(seconds=delay * 0.5) <= job.run_at
+        assert job.run_at <= datetime.utcnow() + timedelta(seconds=delay)
+        # Not runnable again until the backoff passes
+        assert not queue.run_once()
+        make_due(app, job_id)
+
+    assert queue.run_once()
+    job = stored(app, job_id)
+    assert (job.status, job.attempts) == ('failed', 3)
+    assert job.finished_at is not None
+    assert len(calls) == 3
+
+def test_delayed_job_waits(app, queue, calls):
+    add_job(app, 'succeed', delay=60)
+    assert not queue.run_once()
+    assert calls == []
+
+def test_claimed_job_is_not_claimed_twice(app, queue, calls):
+    job_id = add_job(app, 'succeed')
+    with app.app_context():
+        claimed = queue._claim()
+        assert claimed.id == job_id
+        assert queue._claim() is None
+    job = stored(app, job_id)
+    assert (job.status, job.attempts) == ('running', 1)
+    assert job.locked_until > datetime.utcnow()
+
+def test_lapsed_visibility_timeout_is_reclaimed(app, queue, calls):
+    job_id = add_job(app, 'succeed')
+    with app.app_context():
+        queue._claim()
+        # The worker holding it died
+        db.session.execute(db.update(Job).filter_by(id=job_id).values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+    assert queue.run_once()
+    job = stored(app, job_id)
+    assert (job.status, job.attempts) == ('done', 2)
+
+def test_stale_worker_cannot_finish_a_reclaimed_job(app, queue, calls):
+    job_id = add_job(app, 'succeed')
+    with app.app_context():
+        first = queue._claim()
+        db.session.execute(db.update(Job).filter_by(id=job_id).values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+        db.session.commit()
+        second = queue._claim()
+        assert second.attempts == first.attempts + 1
+        queue._finish(first.id, first.attempts, status='done', finished_at=datetime.utcnow())
+    job = stored(app, job_id)
+    assert (job.status, job.attempts) == ('running', 2)
+
+def test_unknown_task_fails_without_running(app, queue, calls, monkeypatch):
+    job_id = add_job(app, 'succeed')
+    monkeypatch.delitem(jobs.TASKS, 'succeed')
+    assert not queue.run_once()
+    job = stored(app, job_id)
+    assert job.status == 'failed'
+    assert 'Unknown task' in job.last_error
+
+def test_purge_finished_keeps_recent_and_pending_jobs(app, queue, calls):
+    old = add_job(app, 'succeed')
+    queue.run_once()
+    recent = add_job(app, 'succeed')
+    queue.run_once()
+    pending = add_job(app, 'succeed', delay=60)
+    with app.app_context():
+        db.session.execute(db.update(Job).filter_by(id=old).values(finished_at=datetime.utcnow() - timedelta(days=8)))
+        db.session.commit()
+        with db.engine.begin() as connection:
+            assert purge_finished(connection, 7 * 24 * 60 * 60) == 1
+        assert set(db.session.scalars(db.select(Job.id))) == {recent, pending}
@@ -0,0 +1,213 @@
+import json
+import math
+import time
+from datetime import datetime, timedelta
+import pytest
+import idempotency
+import orders
+import pricing
+from idempotency import request_hash
+from models import db, IdempotencyKey, Job, Order, OrderProduct, Product
+from pricing import InvalidOrderLine
+
+def test_empty_order_rejected(seeded, client, busiest_customer, auth_headers):
+    response = client.post('/orders', json={'order_products': []}, headers=auth_headers(busiest_customer))
+    assert response.status_code == 422
+
+def test_bulk_orders_reject_bad_items(seeded, client, auth_headers):
+    with seeded.app_context():
+        product_id = db.session.scalar(db.select(Product.id).limit(1))
+    line = {'product_id': product_id, 'quantity': 2}
+    response = client.post('/orders/bulk', headers=auth_headers(1, 'admin'), json=[
+        {'order_products': [line]},
+        {'user_id': [2], 'order_products': [line]},
+        {'user_id': True, 'order_products': [line]},
+        {'user_id': 2, 'order_products': []},
+    ])
+    assert response.status_code == 207
+    assert [result['status'] for result in response.get_json()['results']] == [201, 422, 422, 422]
+
+def test_bulk_orders_enqueue_confirmations(seeded, client, auth_headers, order_body):
+    response = client.post('/orders/bulk', headers=auth_headers(1, 'admin'), json=[order_body, order_body])
+    assert response.status_code == 201
+    order_ids = [result['id'] for result in response.get_json()['results']]
+    with seeded.app_context():
+        jobs = db.session.scalars(db.select(Job).filter_by(task='send_order_confirmation')).all()
+    assert sorted(job.payload['order_id'] for job in jobs) == sorted(order_ids)
+
+def order_count(app):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count(Order.id)))
+
+@pytest.fixture
+def order_body(seeded):
+    with seeded.app_context():
+        product_id = db.session.scalar(db.select(Product.id).limit(1))
+    return {'order_products': [{'product_id': product_id, 'quantity': 2}]}
+
+def test_idempotent_retry_replays_first_response(seeded, client, busiest_customer, auth_headers, order_body):
+    headers = {**auth_headers(busiest_customer), 'Idempotency-Key': 'checkout-1'}
+    first = client.post('/orders', json=order_body, headers=headers)
+    assert first.status_code == 201
+    count = order_count(seeded)
+
+    retry = client.post('/orders', json=order_body, headers=headers)
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert order_count(seeded) == count
+
+def test_idempotency_key_reused_for_another_body(seeded, client, busiest_customer, auth_headers, order_body):
+    headers = {**auth_headers(busiest_customer), 'Idempotency-Key': 'checkout-1'}
+    assert client.post('/orders', json=order_body, headers=headers).status_code == 201
+    order_body['order_products'][0]['quantity'] = 3
+    assert client.post('/orders', json=order_body, headers=headers).status_code == 422
+
+def test_expired_idempotency_key_is_new(seeded, client, busiest_customer, auth_headers, order_body):
+    headers = {**auth_headers(busiest_customer), 'Idempotency-Key': 'checkout-1'}
+    first = client.post('/orders', json=order_body, headers=headers)
+    with seeded.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(created_at=datetime.utcnow() - timedelta(days=2)))
+        db.session.commit()
+    second = client.post('/orders', json=order_body, headers=headers)
+    assert second.status_code == 201
+    assert 'Idempotent-Replayed' not in second.headers
+    assert second.get_json()['id'] != first.get_json()['id']
+
+def test_concurrent_idempotent_requests_replay_the_winner(seeded, client, busiest_customer, auth_headers, order_body,
+                                                           monkeypatch):
+    winner = {'id': 1, 'total_price': 1.0}
+    lookups = []
+
+    # The other request stores its response after this one has looked the key up and found nothing
+    def find_response(user_id, key, ttl):
+        lookups.append(key)
+        if len(lookups) == 1:
+            db.session.add(IdempotencyKey(user_id=user_id, key=key, request_hash=request_hash(order_body),
+                                          status_code=201, response_body=json.dumps(winner)))
+            db.session.commit()
+            return None
+        return idempotency.find_response(user_id, key, ttl)
+
+    monkeypatch.setattr(orders, 'find_response', find_response)
+    count = order_count(seeded)
+    headers = {**auth_headers(busiest_customer), 'Idempotency-Key': 'checkout-1'}
+    response = client.post('/orders', json=order_body, headers=headers)
+    assert response.status_code == 201
+    assert response.get_json() == winner
+    assert response.headers['Idempotent-Replayed'] == 'true'
+    assert order_count(seeded) == count
+
+def test_purge_expired_idempotency_keys(seeded, client, busiest_customer, auth_headers, order_body):
+    client.post('/orders', json=order_body, headers={**auth_headers(busiest_customer), 'Idempotency-Key': 'old'})
+    with seeded.app_context():
+        db.session.execute(db.update(IdempotencyKey).values(created_at=datetime.utcnow() - timedelta(days=2)))
+        db.session.commit()
+    client.post('/orders', json=order_body, headers={**auth_headers(busiest_customer), 'Idempotency-Key': 'new'})
+    with seeded.app_context():
+        with db.engine.begin() as connection:
+            assert idempotency.purge_expired(connection, 24 * 60 * 60) == 1
+        assert db.session.scalars(db.select(IdempotencyKey.key)).all() == ['new']
+
+def product_price(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).price
+
+def insert_product_unseen(app, price):
+    # Straight through the engine, so no commit hook tells the price index about it
+    with app.app_context(), db.engine.begin() as connection:
+        return connection.execute(
+            db.insert(Product.__table__).values(category='beamblock', price=price, description='Unseen').returning(Product.id)
+        ).scalar()
+
+def test_order_is_priced_by_the_catalog(seeded, client, busiest_customer, auth_headers, order_body):
+    line = order_body['order_products'][0]
+    line.update(price=0.01, subtotal=0.01)
+    response = client.post('/orders', json={**order_body, 'total_price': 0.01}, headers=auth_headers(busiest_customer))
+    assert response.status_code == 201
+    assert response.get_json()['total_price'] == round(product_price(seeded, line['product_id']) * 2, 2)
+
+def test_order_for_product_newer_than_price_index(seeded, client, busiest_customer, auth_headers, order_body):
+    headers = auth_headers(busiest_customer)
+    assert client.post('/orders', json=order_body, headers=headers).status_code == 201
+    product_id = insert_product_unseen(seeded, 42.5)
+    response = client.post('/orders', json={'order_products': [{'product_id': product_id, 'quantity': 2}]}, headers=headers)
+    assert response.status_code == 201
+    assert response.get_json()['total_price'] == 85.0
+
+def test_order_for_unknown_product_is_rejected(seeded, client, busiest_customer, auth_headers):
+    count = order_count(seeded)
+    response = client.post('/orders', json={'order_products': [{'product_id': 10 ** 6}]},
+                           headers=auth_headers(busiest_customer))
+    assert response.status_code == 422
+    assert response.get_json() == {'error': f'Unknown product_id {10 ** 6}'}
+    assert order_count(seeded) == count
+
+@pytest.fixture
+def price_index(seeded, monkeypatch):
+    index = seeded.extensions['price_index']
+    loads = []
+    load = index._load
+    monkeypatch.setattr(index, '_load', lambda: (loads.append(1), load()))
+    index.loads = loads
+    return index
+
+def line(product_id, category=None, quantity=1):
+    return {'key': 'product_id', 'category': category, 'product_id': product_id, 'quantity': quantity}
+
+def test_price_index_marks_missing_ids(seeded, price_index):
+    with seeded.app_context():
+        ids = sorted(db.session.scalars(db.select(Product.id)))
+        gap = ids[1]
+        db.session.execute(db.delete(OrderProduct).filter_by(product_id=gap))
+        db.session.execute(db.delete(Product).filter_by(id=gap))
+        db.session.commit()
+        prices, _ = price_index.snapshot()
+        assert math.isnan(prices[gap])
+        for product_id in (gap, 0, -1, ids[-1] + 1):
+            with pytest.raises(InvalidOrderLine):
+                price_index.price_lines([line(product_id)])
+        # A category key must match the product's category
+        category = db.session.get(Product, ids[0]).category
+        other = next(name for name in ('beamblock', 'service') if name != category)
+        with pytest.raises(InvalidOrderLine):
+            price_index.price_lines([line(ids[0], other)])
+        assert price_index.price_lines([line(ids[0], category, 3)]) == [round(product_price(seeded, ids[0]) * 3, 2)]
+
+def test_price_index_refreshes_once_on_a_miss(seeded, price_index):
+    with seeded.app_context():
+        price_index.snapshot()
+    product_id = insert_product_unseen(seeded, 10.0)
+    with seeded.app_context():
+        assert price_index.price_lines([line(product_id, quantity=3)]) == [30.0]
+        assert len(price_index.loads) == 2
+        with pytest.raises(InvalidOrderLine):
+            price_index.price_lines([line(10 ** 6)])
+        assert len(price_index.loads) == 3
+
+def test_price_index_reloads_after_ttl(seeded, price_index, order_body, monkeypatch):
+    product_id = order_body['order_products'][0]['product_id']
+    with seeded.app_context():
+        old_price = price_index.price_lines([line(product_id)])[0]
+        with db.engine.begin() as connection:
+            connection.execute(db.update(Product.__table__).where(Product.id == product_id).values(price=old_price + 1))
+        # Another worker's write is only seen once the TTL lapses
+        assert price_index.price_lines([line(product_id)]) == [old_price]
+        later = time.monotonic() + price_index.ttl + 1
+        monkeypatch.setattr(pricing.time, 'monotonic', lambda: later)
+        assert price_index.price_lines([line(product_id)]) == [round(old_price + 1, 2)]
+
+def test_committed_price_change_reprices_immediately(seeded, price_index, order_body):
+    product_id = order_body['order_products'][0]['product_id']
+    with seeded.app_context():
+        price_index.price_lines([line(product_id)])
+        db.session.get(Product, product_id).price = 1234.5
+        db.session.commit()
+        assert price_index.price_lines([line(product_id)]) == [1234.5]
+
+@pytest.mark.parametrize('body', [[], 'x', 3, None])
+def test_order_body_must_be_an_object(seeded, client, busiest_customer, auth_headers, body):
+    response = client.post('/orders', data=json.dumps(body), content_type='application/json',
+                           headers=auth_headers(busiest_customer))
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Malformed order data'}
@@ -0,0 +1,44 @@
+import re
+import pytest
+from sqlalchemy.exc import OperationalError
+from app import create_app
+from models import db
+from tests.conftest import close_app
+
+@pytest.fixture
+def app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'TESTING': True, 'REQUEST_METRICS': True})
+    with app.app_context():
+        db.create_all()
+
+    @app.route('/test/failing-query')
+    def failing_query():
+        try:
+            db.session.execute(db.text('SELECT * FROM no_such_table'))
+        except OperationalError:
+            db.session.rollback()
+        db.session.execute(db.text('SELECT 1'))
+        return {}
+
+    yield app
+    close_app(app)
+
+def server_timing(response):
+    return re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers['Server-Timing']).group(1)
+
+def test_server_timing_counts_queries(client):
+    response = client.get('/products')
+    assert response.status_code == 200
+    assert server_timing(response) == '1'
+
+def test_failed_statement_leaves_connection_clean(app, client):
+    response = client.get('/test/failing-query')
+    assert response.status_code == 200
+    assert server_timing(response) == '1'
+    with app.app_context(), db.engine.connect() as connection:
+        assert not [key for key in connection.info if 'started' in str(key)]
+
+def test_metrics_endpoint_reports_routes(client):
+    client.get('/products')
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'matrix_request_sql_queries_count{method="GET",route="/products"} 1' in body
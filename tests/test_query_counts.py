@@ -0,0 +1,20 @@
+from models import db, Order
+
+def test_order_history_query_budget(seeded, client, auth_headers, busiest_customer, query_counter):
+    headers = auth_headers(busiest_customer)
+    with query_counter() as counter:
+        response = client.get('/orders', headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) > 20
+    # The orders, then every line with its product
+    counter.assert_at_most(2)
+
+def test_single_order_query_budget(seeded, client, auth_headers, busiest_customer, query_counter):
+    with seeded.app_context():
+        order_id = db.session.execute(db.select(Order.id).filter_by(user_id=busiest_customer).limit(1)).scalar()
+    headers = auth_headers(busiest_customer)
+    with query_counter() as counter:
+        response = client.get(f'/orders/{order_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['order_products']
+    counter.assert_at_most(1)
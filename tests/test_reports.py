@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import reports
+from models import db, Order, OrderDailyRollup, OrderProduct, User, rebuild_daily_rollup
+
+def rollup(app):
+    with app.app_context():
+        return sorted(
+            (row.day, row.product_id, row.quantity, row.line_count, round(row.revenue, 2))
+            for row in db.session.scalars(db.select(OrderDailyRollup))
+        )
+
+def test_rollup_follows_cascaded_order_deletes(seeded, client, busiest_customer, auth_headers):
+    before = rollup(seeded)
+    response = client.delete(f'/users/{busiest_customer}', headers=auth_headers(1, 'admin'))
+    assert response.status_code == 200
+    after = rollup(seeded)
+    assert after != before
+
+    with seeded.app_context(), db.engine.begin() as connection:
+        rebuild_daily_rollup(connection)
+    assert after == rollup(seeded)
+
+def table_count(app, model):
+    with app.app_context():
+        return db.session.scalar(db.select(db.func.count()).select_from(model))
+
+def test_ndjson_export_streams_every_row(seeded, client, auth_headers):
+    response = client.get('/export/users', headers=auth_headers(1, 'admin'))
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="users.ndjson"'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(records) == table_count(seeded, User)
+    assert set(records[0]) == set(User.projection.fields)
+    assert 'password' not in records[0]
+
+def test_csv_export(seeded, client, auth_headers):
+    response = client.get('/export/orders?format=csv', headers=auth_headers(1, 'admin'))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == Order.projection.fields
+    assert len(rows) - 1 == table_count(seeded, Order)
+    # Ordered by id across batches
+    ids = [int(row[0]) for row in rows[1:]]
+    assert ids == sorted(ids)
+
+def test_order_lines_export_spans_batches(seeded, client, auth_headers, monkeypatch):
+    monkeypatch.setattr(reports, 'EXPORT_BATCH_SIZE', 7)
+    response = client.get('/export/order-lines', headers=auth_headers(1, 'admin'))
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == table_count(seeded, OrderProduct)
+
+def test_export_errors(seeded, client, auth_headers):
+    admin = auth_headers(1, 'admin')
+    assert client.get('/export/products', headers=admin).status_code == 404
+    assert client.get('/export/users?format=xml', headers=admin).status_code == 400
+    assert client.get('/export/users', headers=auth_headers(2)).status_code == 403
+    assert client.get('/export/users').status_code == 401
+
+def test_reports_are_admin_only(seeded, client, auth_headers):
+    for path in ('/reports/revenue', '/reports/top-products'):
+        assert client.get(path, headers=auth_headers(2)).status_code == 403
+        assert client.get(path, headers=auth_headers(1, 'admin')).status_code == 200
+
+def test_report_shapes_and_filters(seeded, client, auth_headers):
+    admin = auth_headers(1, 'admin')
+    days = client.get('/reports/revenue', headers=admin).get_json()
+    assert set(days[0]) == {'day', 'revenue', 'quantity', 'lines'}
+    assert [day['day'] for day in days] == sorted(day['day'] for day in days)
+    middle = days[len(days) // 2]['day']
+    later = client.get(f'/reports/revenue?from={middle}', headers=admin).get_json()
+    assert later[0]['day'] == middle
+    assert client.get('/reports/revenue?from=yesterday', headers=admin).status_code == 400
+
+    top = client.get('/reports/top-products?limit=5', headers=admin).get_json()
+    assert len(top) == 5
+    assert set(top[0]) == {'product_id', 'category', 'revenue', 'quantity'}
+    assert [product['revenue'] for product in top] == sorted((product['revenue'] for product in top), reverse=True)
+    services = client.get('/reports/top-products?category=service', headers=admin).get_json()
+    assert services and all(product['category'] == 'service' for product in services)
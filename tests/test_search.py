@@ -0,0 +1,58 @@
+import pytest
+from models import db, BeamBlock, Service
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        products = [
+            BeamBlock(price=10, description='Reinforced beam block'),
+            BeamBlock(price=11, description='Reinforced reinforced reinforced beam'),
+            Service(price=12, description='Installation service for paving'),
+        ]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+def search(client, query, **params):
+    response = client.get('/search', query_string={'q': query, **params})
+    assert response.status_code == 200, response.get_json()
+    return [product['id'] for product in response.get_json()]
+
+def test_results_are_ranked_by_bm25(client, products):
+    assert search(client, 'reinforced') == [products[1], products[0]]
+    assert search(client, 'reinforced', category='service') == []
+    # Terms match as prefixes
+    assert search(client, 'install') == [products[2]]
+
+def test_index_follows_inserts_updates_and_deletes(app, client, products):
+    assert search(client, 'kerb') == []
+    with app.app_context():
+        product = BeamBlock(price=13, description='Kerb stone')
+        db.session.add(product)
+        db.session.commit()
+        new_id = product.id
+    assert search(client, 'kerb') == [new_id]
+
+    with app.app_context():
+        db.session.get(BeamBlock, new_id).description = 'Paving slab'
+        db.session.commit()
+    assert search(client, 'kerb') == []
+    assert sorted(search(client, 'paving')) == sorted([products[2], new_id])
+
+    with app.app_context():
+        db.session.delete(db.session.get(BeamBlock, new_id))
+        db.session.commit()
+    assert search(client, 'paving') == [products[2]]
+
+# Operators become literal terms that must match too, so they narrow results instead of erroring
+@pytest.mark.parametrize('query, matches', [
+    ('"reinforced', True), ('reinforced*', True), ('-reinforced', True), ('^reinforced', True),
+    ('reinforced OR', False), ('reinforced AND NOT', False), ('NEAR(reinforced', False),
+    ('description:reinforced', False), ('beam NOT', False),
+])
+def test_fts_syntax_in_queries_is_literal(client, products, query, matches):
+    assert (products[0] in search(client, query)) == matches
+
+@pytest.mark.parametrize('query', ['"', '*', '()', ''])
+def test_queries_without_terms_are_rejected(client, products, query):
+    assert client.get('/search', query_string={'q': query}).status_code == 400
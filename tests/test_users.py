@@ -0,0 +1,29 @@
+import pytest
+from models import db, User
+
+# Two admins, so one can demote or delete the other while the other's token is still valid
+@pytest.fixture
+def admins(seeded, client, auth_headers):
+    with seeded.app_context():
+        db.session.get(User, 2).role = 'admin'
+        db.session.commit()
+    target = auth_headers(1, 'admin')
+    # Caches admin 1's role, as any request before the change would
+    assert client.get('/cache/stats', headers=target).status_code == 200
+    return target, auth_headers(2, 'admin')
+
+def test_demoted_admin_loses_access_before_token_expires(client, admins):
+    target, other = admins
+    assert client.patch('/users/1', json={'role': 'customer'}, headers=other).status_code == 200
+    assert client.get('/cache/stats', headers=target).status_code == 403
+    assert client.get('/users/2', headers=target).status_code == 403
+
+def test_deleted_admin_loses_access_before_token_expires(client, admins):
+    target, other = admins
+    assert client.delete('/users/1', headers=other).status_code == 200
+    assert client.get('/cache/stats', headers=target).status_code == 404
+    assert client.delete('/users/3', headers=target).status_code == 403
+
+def test_customer_claim_is_not_upgraded(seeded, client, auth_headers):
+    # A token issued while user 1 was a customer stays a customer token
+    assert client.get('/cache/stats', headers=auth_headers(1, 'customer')).status_code == 403
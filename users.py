@@ -0,0 +1,119 @@
+from flask import make_response, request, jsonify, abort
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_restful import Resource
+from auth import current_role
+from catalog import requested_expansions
+from extensions import password_hasher
+from hashing import HasherBusy
+from models import db, User
+
+def login():
+    data = request.get_json()
+    email = data.get('email')
+    password = data.get('password')
+
+    user = User.query.filter_by(email=email).first()
+
+    if user and password_hasher.check_password_hash(user.password, password):
+        # Upgrade hashes made with a different work factor while we have the plain password
+        if password_hasher.needs_rehash(user.password):
+            try:
+                user.password = password_hasher.generate_password_hash(password)
+                db.session.commit()
+            except HasherBusy:
+                pass
+        access_token = create_access_token(identity=user.user_id, additional_claims={"role": user.role})
+        response = {
+            "access_token": access_token,
+            "role": user.role,
+            "id": user.user_id
+        }
+        return make_response(jsonify(response), 200)
+    else:
+        return make_response(jsonify({"error": "Invalid credentials"}), 401)
+
+def create_admin():
+    if not request.json.get('admin_key') == 'YOUR_SECRET_KEY':
+        return jsonify({"error": "Unauthorized"}), 403
+
+    username = request.json.get('username')
+    password = request.json.get('password')
+
+    hashed_password = password_hasher.generate_password_hash(password)  # Hash the password
+    new_admin = User(username=username, password=hashed_password, role='admin')
+    db.session.add(new_admin)
+    db.session.commit()
+
+    return jsonify({"message": "Admin created successfully"}), 201
+
+# Users Resource
+class Users(Resource):
+    def get(self):
+        users = User.projection.expand(User.projection.fetch(), requested_expansions())
+        return make_response(jsonify(users), 200)
+
+    def post(self):
+        data = request.get_json()
+        email = data['email']
+
+        existing_user = User.query.filter_by(email=email).first()
+        if existing_user:
+            return make_response(jsonify({"error": "Email already exists"}), 422)
+
+        new_user = User(
+            user_name=data['user_name'],
+            email=email,
+            password=password_hasher.generate_password_hash(data.get("password")),
+            role=data.get('role', 'customer'),
+            phone_number=data['phone_number']
+        )
+        db.session.add(new_user)
+        db.session.commit()
+
+        access_token = create_access_token(identity=new_user.user_id, additional_claims={"role": new_user.role})
+
+        response = {
+            "user": new_user.to_dict(),
+            "access_token": access_token
+        }
+
+        return make_response(jsonify(response), 201)
+
+# UserByID Resource
+class UserByID(Resource):
+    @jwt_required()
+    def get(self, user_id):
+        current_user_id = get_jwt_identity()
+        if user_id != current_user_id and current_role() != 'admin':
+            return make_response(jsonify({"error": "Access denied"}), 403)
+        users = User.projection.fetch(User.projection.statement.where(User.user_id == user_id))
+        if not users:
+            abort(404)
+        return make_response(jsonify(users[0]), 200)
+
+    @jwt_required()
+    def patch(self, user_id):
+        current_user_id = get_jwt_identity()
+        if user_id != current_user_id and current_role() != 'admin':
+            return make_response(jsonify({"error": "Access denied"}), 403)
+        user = User.query.get_or_404(user_id)
+        data = request.get_json()
+        for key, value in data.items():
+            setattr(user, key, value)
+        db.session.commit()
+        return make_response(jsonify(user.to_dict()), 200)
+
+    @jwt_required()
+    def delete(self, user_id):
+        if current_role() != 'admin':
+            return make_response(jsonify({"error": "Admin access required"}), 403)
+        user = User.query.get_or_404(user_id)
+        db.session.delete(user)
+        db.session.commit()
+        return make_response(jsonify({"message": "User deleted"}), 200)
+
+def register(app, api):
+    app.add_url_rule('/login', view_func=login, methods=['POST'])
+    app.add_url_rule('/create_admin', view_func=create_admin, methods=['POST'])
+    api.add_resource(Users, '/users')
+    api.add_resource(UserByID, '/users/<int:user_id>')